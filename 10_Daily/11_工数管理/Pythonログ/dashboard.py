@@ -1,10 +1,22 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-from collections import defaultdict
 import matplotlib.pyplot as plt
-from openpyxl import load_workbook
+import io
 import os
+import sys
+
+# トラッカーと同じ読み込み処理（bin/worklog_frame.py）を使う
+TOOLS_BIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "70_Frameworks", "74_AI_Systems", "74_1_Tools_Settings", "bin")
+sys.path.insert(0, os.path.normpath(TOOLS_BIN))
+from task_groups import load_task_groups
+from worklog_cube import MEMBER_COLUMN, build_cube, member_breakdown, settings_signature, slice_cube, task_totals, trend
+from worklog_frame import log_signature, match_rows, page_rows
+from worklog_live import LiveWorkLog
+from worklog_team import discover_logs, load_team, team_signature
+from window_batch import process_folder
+from window_rules import RULES_FILE
+from window_sessions import SESSIONS_FILE, load_sessions_frame, sample_files
 
 # ページ設定
 st.set_page_config(
@@ -19,6 +31,18 @@ plt.rcParams['axes.unicode_minus'] = False
 
 # Excelファイルパス（固定）
 LOG_FILE = r"C:\Users\akasaka.kazuyuki\OneDrive - ユーザーサイド株式会社\strat-lab\strat-lab\10_Daily\11_工数管理\Pythonログ\work_log.xlsx"
+# タスクのグループ分けはトラッカーの設定を使う
+SETTINGS_FILE = os.path.normpath(os.path.join(TOOLS_BIN, "..", "configs", "tracker_settings.json"))
+# 作業ウィンドウチェック式のログ（1分ごとのウィンドウタイトル）のフォルダ
+WINDOW_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "作業ウィンドウチェック式")
+# チーム表示の既定フォルダ（各メンバーの work_log.xlsx を置く共有フォルダ）
+TEAM_DIR = ""
+# タスク数がこれを超える期間は既定で軽量グラフ（Streamlit標準のグラフ）にする
+NATIVE_CHART_TASKS = 30
+# 詳細データの1ページの件数の選択肢
+PAGE_SIZES = [50, 100, 500]
+# 詳細データの並べ替え（表示名 → 列。None は記録順）
+SORT_COLUMNS = {"記録順": None, "日付": "日付", "タスク": "タスク", "時間": "分"}
 
 # カスタムCSS
 st.markdown("""
@@ -40,73 +64,97 @@ st.title("📊 工数管理ダッシュボード")
 st.markdown("---")
 
 # データ読み込み
-@st.cache_data(ttl=60)  # 60秒キャッシュ
-def load_data():
-    if not os.path.exists(LOG_FILE):
-        return pd.DataFrame()
-    
-    wb = load_workbook(LOG_FILE)
-    ws = wb.active
-    data = []
-    
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        if row[0]:
-            try:
-                date_str = str(row[0]).split()[0]
-                for fmt in ("%Y/%m/%d", "%Y-%m-%d"):
-                    try:
-                        row_date = datetime.strptime(date_str, fmt).date()
-                        break
-                    except:
-                        continue
-                else:
-                    continue
-                
-                data.append({
-                    "日付": row_date,
-                    "開始": row[1],
-                    "終了": row[2],
-                    "タスク": row[3],
-                    "分": float(row[4]) if row[4] else 0,
-                    "メモ": row[5] if row[5] else ""
-                })
-            except:
-                continue
-    
-    return pd.DataFrame(data)
+# 読み込んだ DataFrame と集計キューブはプロセス内に持ち続け、ログが変わったら追記された行だけ取り込む
+# （途中の行が編集されていたときだけ全件を読み直す）
+@st.cache_resource
+def live_log():
+    return LiveWorkLog(LOG_FILE, SETTINGS_FILE)
+
+def load_live():
+    live = live_log()
+    live.refresh()
+    return live.frame, live.cube
+
+# チーム表示：全員分をメンバー列付きで結合（変わったファイルだけプロセスプールで並列に読み直す）
+@st.cache_data(max_entries=4)
+def load_team_for(signature):
+    return load_team({member: path for member, path, _ in signature})
+
+@st.cache_data(max_entries=4)
+def load_team_cube_for(signature, groups_signature):
+    return build_cube(load_team_for(signature), load_task_groups(SETTINGS_FILE))
 
-df = load_data()
+# 作業ウィンドウチェック式：ログ・振り分けルール・グループ分けのどれかが変わったら、変わったファイルだけ処理し直す
+def window_signature():
+    paths = [RULES_FILE, SETTINGS_FILE] + sample_files(WINDOW_LOG_DIR)
+    return tuple((path, settings_signature(path)) for path in paths)
+
+@st.cache_data(max_entries=2)
+def load_window_sessions_for(signature):
+    process_folder(WINDOW_LOG_DIR)
+    return load_sessions_frame(os.path.join(WINDOW_LOG_DIR, SESSIONS_FILE))
+
+# サイドバー：フィルタ
+st.sidebar.header("⚙️ 表示設定")
+scope = st.sidebar.radio("表示対象", ["自分", "チーム"], horizontal=True)
+team_mode = scope == "チーム"
+
+if team_mode:
+    team_dir = st.sidebar.text_input("チームフォルダ", value=TEAM_DIR)
+    if not team_dir or not os.path.isdir(team_dir):
+        st.info("チームフォルダ（各メンバーの work_log.xlsx がある共有フォルダ）を指定してください")
+        st.stop()
+    signature = team_signature(discover_logs(team_dir))
+    df = load_team_for(signature)
+    cube = load_team_cube_for(signature, settings_signature(SETTINGS_FILE))
+else:
+    signature = log_signature(LOG_FILE)
+    df, cube = load_live()
+# グラフのキャッシュキーに使うデータの版（ログか設定が変われば変わる）
+data_version = (signature, settings_signature(SETTINGS_FILE))
 
 if df.empty:
     st.error("データが見つかりません")
     st.stop()
 
-# サイドバー：フィルタ
-st.sidebar.header("⚙️ 表示設定")
+if team_mode:
+    all_members = sorted(df[MEMBER_COLUMN].unique())
+    members = st.sidebar.multiselect("メンバー", all_members, default=all_members)
+    df = df[df[MEMBER_COLUMN].isin(members)]
+    cube = cube[cube[MEMBER_COLUMN].isin(members)]
+    if df.empty:
+        st.warning("メンバーを選択してください")
+        st.stop()
+    data_version += (tuple(members),)
+
 mode = st.sidebar.radio("表示モード", ["日別", "期間指定", "全期間"], index=1)
 
 if mode == "日別":
     target_date = st.sidebar.date_input("日付", value=df["日付"].max())
-    filtered_df = df[df["日付"] == target_date]
+    period_rows = np.flatnonzero((df["日付"] == target_date).to_numpy())
+    date_range = (target_date, target_date)
+    filtered_cube = slice_cube(cube, *date_range)
     title_suffix = f"({target_date})"
 elif mode == "期間指定":
     col1, col2 = st.sidebar.columns(2)
     start_date = col1.date_input("開始", value=df["日付"].min())
     end_date = col2.date_input("終了", value=df["日付"].max())
-    filtered_df = df[(df["日付"] >= start_date) & (df["日付"] <= end_date)]
+    period_rows = np.flatnonzero(((df["日付"] >= start_date) & (df["日付"] <= end_date)).to_numpy())
+    date_range = (start_date, end_date)
+    filtered_cube = slice_cube(cube, *date_range)
     title_suffix = f"({start_date} 〜 {end_date})"
 else:
-    filtered_df = df
+    period_rows = None
+    date_range = None
+    filtered_cube = cube
     title_suffix = "(全期間)"
 
-if filtered_df.empty:
+if filtered_cube.empty:
     st.warning("指定期間にデータがありません")
     st.stop()
 
-# タスク別集計
-task_time = defaultdict(float)
-for _, row in filtered_df.iterrows():
-    task_time[row["タスク"]] += row["分"]
+# タスク別集計（キューブの該当期間を合計するだけ）
+task_time = task_totals(filtered_cube)
 
 # カラーパレット
 distinct_colors = [
@@ -115,51 +163,43 @@ distinct_colors = [
     '#E07A5F', '#81B29A', '#F2CC8F', '#A8DADC', '#E63946'
 ]
 
-# サマリー表示
-st.subheader(f"📈 工数サマリー {title_suffix}")
-col1, col2, col3 = st.columns(3)
-total_hours = sum(task_time.values()) / 60
-col1.metric("総工数", f"{total_hours:.1f} 時間")
-col2.metric("タスク数", len(task_time))
-col3.metric("記録日数", filtered_df["日付"].nunique())
+def style_axes(ax, grid_axis):
+    ax.tick_params(colors='#f1f5f9', labelsize=10)
+    ax.spines['bottom'].set_color('#94a3b8')
+    ax.spines['left'].set_color('#94a3b8')
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.grid(axis=grid_axis, color='#2d3748', linestyle='--', linewidth=0.5, alpha=0.7)
 
-st.markdown("---")
+def figure_png(fig):
+    # PNGにして Figure は閉じる（開いたままだと長時間の利用でメモリが増え続ける）
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=200, bbox_inches="tight", facecolor=fig.get_facecolor())
+    plt.close(fig)
+    return buf.getvalue()
 
-# グラフ表示
-col_left, col_right = st.columns(2)
+# グラフは (データの版, 表示条件) ごとに1回だけ描いてPNGをキャッシュする。
+# 引数名が _ で始まるものはキャッシュキーに含めない（内容はデータの版と表示条件で決まる）
+@st.cache_data(max_entries=32)
+def render_task_charts(data_version, title_suffix, _task_time):
+    tasks = list(_task_time.keys())
+    times = [_task_time[t]/60 for t in tasks]
+    colors = [distinct_colors[i % len(distinct_colors)] for i in range(len(tasks))]
 
-with col_left:
-    st.subheader(f"タスク別工数 {title_suffix}")
     fig1, ax1 = plt.subplots(figsize=(6, 5), facecolor='#1a1a2e')
     ax1.set_facecolor('#16213e')
-    
-    tasks = list(task_time.keys())
-    times = [task_time[t]/60 for t in tasks]
-    colors = [distinct_colors[i % len(distinct_colors)] for i in range(len(tasks))]
-    
     ax1.barh(tasks, times, color=colors)
     ax1.set_xlabel('時間 (h)', color='#f1f5f9', fontsize=11)
-    ax1.tick_params(colors='#f1f5f9', labelsize=10)
-    ax1.spines['bottom'].set_color('#94a3b8')
-    ax1.spines['left'].set_color('#94a3b8')
-    ax1.spines['top'].set_visible(False)
-    ax1.spines['right'].set_visible(False)
-    ax1.grid(axis='x', color='#2d3748', linestyle='--', linewidth=0.5, alpha=0.7)
-    
-    st.pyplot(fig1)
+    style_axes(ax1, 'x')
 
-with col_right:
-    st.subheader(f"タスク割合 {title_suffix}")
     fig2, ax2 = plt.subplots(figsize=(6, 5), facecolor='#1a1a2e')
     ax2.set_facecolor('#16213e')
     
-    sizes = [task_time[t]/60 for t in tasks]
-    
     def autopct_format(pct):
         return f'{pct:.1f}%' if pct > 3 else ''
     
     wedges, texts, autotexts = ax2.pie(
-        sizes,
+        times,
         labels=tasks,
         autopct=autopct_format,
         colors=colors,
@@ -175,17 +215,135 @@ with col_right:
     
     for text in texts:
         text.set_fontsize(9)
-    
-    st.pyplot(fig2)
+
+    return figure_png(fig1), figure_png(fig2)
+
+@st.cache_data(max_entries=32)
+def render_trend_chart(data_version, title_suffix, period, stack_by, _trend_table):
+    fig3, ax3 = plt.subplots(figsize=(12, 4), facecolor='#1a1a2e')
+    ax3.set_facecolor('#16213e')
+    labels = [d.strftime('%Y/%m' if period == "月別" else '%m/%d') for d in _trend_table.index]
+    bottom = [0.0] * len(_trend_table)
+    for i, name in enumerate(_trend_table.columns):
+        values = _trend_table[name].tolist()
+        ax3.bar(labels, values, bottom=bottom, label=name, color=distinct_colors[i % len(distinct_colors)])
+        bottom = [b + v for b, v in zip(bottom, values)]
+    ax3.set_ylabel('時間 (h)', color='#f1f5f9', fontsize=11)
+    style_axes(ax3, 'y')
+    ax3.tick_params(labelsize=9)
+    ax3.legend(loc='upper left', bbox_to_anchor=(1, 1), facecolor='#16213e', labelcolor='#f1f5f9', fontsize=9, frameon=False)
+    if len(labels) > 12:
+        plt.setp(ax3.get_xticklabels(), rotation=45, ha='right')
+    return figure_png(fig3)
+
+@st.cache_data(max_entries=32)
+def render_member_chart(data_version, title_suffix, _member_table):
+    fig4, ax4 = plt.subplots(figsize=(12, max(2, 0.4 * len(_member_table) + 1)), facecolor='#1a1a2e')
+    ax4.set_facecolor('#16213e')
+    left = [0.0] * len(_member_table)
+    for i, name in enumerate(_member_table.columns):
+        values = _member_table[name].tolist()
+        ax4.barh(list(_member_table.index), values, left=left, label=name, color=distinct_colors[i % len(distinct_colors)])
+        left = [l + v for l, v in zip(left, values)]
+    ax4.set_xlabel('時間 (h)', color='#f1f5f9', fontsize=11)
+    style_axes(ax4, 'x')
+    ax4.legend(loc='upper left', bbox_to_anchor=(1, 1), facecolor='#16213e', labelcolor='#f1f5f9', fontsize=9, frameon=False)
+    return figure_png(fig4)
+
+# タスクが多い期間は matplotlib の描画を省いて Streamlit 標準のグラフにする
+native_charts = st.sidebar.checkbox("軽量グラフ", value=len(task_time) > NATIVE_CHART_TASKS)
+
+# サマリー表示
+st.subheader(f"📈 工数サマリー {title_suffix}")
+metric_cols = st.columns(4 if team_mode else 3)
+total_hours = sum(task_time.values()) / 60
+metric_cols[0].metric("総工数", f"{total_hours:.1f} 時間")
+metric_cols[1].metric("タスク数", len(task_time))
+metric_cols[2].metric("記録日数", filtered_cube["日付"].nunique())
+if team_mode:
+    metric_cols[3].metric("メンバー数", filtered_cube[MEMBER_COLUMN].nunique())
+
+st.markdown("---")
+
+# グラフ表示
+col_left, col_right = st.columns(2)
+task_hours = pd.Series(task_time, name="時間 (h)") / 60
+
+if native_charts:
+    with col_left:
+        st.subheader(f"タスク別工数 {title_suffix}")
+        st.bar_chart(task_hours)
+    with col_right:
+        st.subheader(f"タスク割合 {title_suffix}")
+        share = (task_hours / task_hours.sum() * 100).round(1).sort_values(ascending=False)
+        st.dataframe(share.rename("割合 (%)"), use_container_width=True, height=400)
+else:
+    bar_png, pie_png = render_task_charts(data_version, title_suffix, task_time)
+    with col_left:
+        st.subheader(f"タスク別工数 {title_suffix}")
+        st.image(bar_png, use_container_width=True)
+    with col_right:
+        st.subheader(f"タスク割合 {title_suffix}")
+        st.image(pie_png, use_container_width=True)
+
+# 推移表示（週・月ごとにグループ or タスクで積み上げ）
+st.markdown("---")
+st.subheader(f"📅 工数の推移 {title_suffix}")
+col_period, col_by = st.columns(2)
+period = col_period.radio("集計単位", ["週別", "月別", "日別"], horizontal=True)
+stack_by = col_by.radio("内訳", ["グループ", "タスク", MEMBER_COLUMN] if team_mode else ["グループ", "タスク"], horizontal=True)
+trend_table = trend(filtered_cube, period, stack_by)
+
+if native_charts:
+    st.bar_chart(trend_table)
+else:
+    st.image(render_trend_chart(data_version, title_suffix, period, stack_by, trend_table), use_container_width=True)
+
+# メンバー別表示（チーム表示のみ）
+if team_mode:
+    st.markdown("---")
+    st.subheader(f"👥 メンバー別工数 {title_suffix}")
+    member_table = member_breakdown(filtered_cube, "グループ")
+    if native_charts:
+        st.bar_chart(member_table)
+    else:
+        st.image(render_member_chart(data_version, title_suffix, member_table), use_container_width=True)
+
+# 画面の記録（作業ウィンドウチェック式のログをルールでタスクに振り分けたもの。自分のみ）
+if not team_mode and sample_files(WINDOW_LOG_DIR):
+    st.markdown("---")
+    st.subheader(f"🖥 画面の記録 {title_suffix}")
+    window_df = load_window_sessions_for(window_signature())
+    if date_range is not None:
+        window_df = window_df[(window_df["日付"] >= date_range[0]) & (window_df["日付"] <= date_range[1])]
+    if window_df.empty:
+        st.info("この期間の画面の記録はありません")
+    else:
+        window_hours = window_df.groupby("タスク", sort=False)["分"].sum().sort_values(ascending=False) / 60
+        st.bar_chart(window_hours.rename("時間 (h)"))
 
 # データテーブル表示
 st.markdown("---")
 st.subheader("📋 詳細データ")
-display_df = filtered_df.copy()
-display_df["時間"] = (display_df["分"] / 60).round(1)
-display_df = display_df[["日付", "開始", "終了", "タスク", "時間", "メモ"]]
-st.dataframe(display_df, use_container_width=True, height=400)
+# 検索・並べ替えはサーバー側で行い、ブラウザには表示中の1ページ分だけ送る
+col_search, col_sort, col_desc, col_size = st.columns([3, 2, 1, 1])
+search = col_search.text_input("検索（タスク・メモ）", value="")
+sort_label = col_sort.selectbox("並べ替え", list(SORT_COLUMNS))
+descending = col_desc.checkbox("降順", value=True)
+page_size = col_size.selectbox("件数", PAGE_SIZES, index=1)
+
+matched_rows = match_rows(df, period_rows, search)
+total_rows = len(matched_rows)
+page_count = max(1, -(-total_rows // page_size))
+page = st.number_input(f"ページ（全{page_count}ページ）", min_value=1, max_value=page_count, value=1, step=1)
+display_df = page_rows(df, matched_rows, page - 1, page_size, SORT_COLUMNS[sort_label], descending)
+
+display_df = display_df.assign(時間=(display_df["分"] / 60).round(1))
+display_df = display_df[([MEMBER_COLUMN] if team_mode else []) + ["日付", "開始", "終了", "タスク", "時間", "メモ"]]
+first_row = (page - 1) * page_size
+st.caption(f"{total_rows}件中 {min(first_row + 1, total_rows)}〜{min(first_row + page_size, total_rows)}件目")
+st.dataframe(display_df, use_container_width=True, height=400, hide_index=True)
 
 # フッター
 st.markdown("---")
-st.caption("🔄 データは60秒ごとに自動更新されます")
\ No newline at end of file
+st.caption("🔄 ログファイルが更新されると次回の表示で自動的に読み直します")
\ No newline at end of file
@@ -1,36 +1,51 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
-import json
 import os
 import subprocess
 import platform
-from datetime import datetime, timedelta
-from collections import defaultdict
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.dates as mdates
-from matplotlib import font_manager
-from openpyxl import load_workbook, Workbook
-from openpyxl.worksheet.table import Table, TableStyleInfo
-
-try:
-    from tkcalendar import DateEntry
-    HAS_CALENDAR = True
-except ImportError:
-    HAS_CALENDAR = False
-
-# 日本語フォント設定
-plt.rcParams['font.sans-serif'] = ['Yu Gothic', 'MS Gothic', 'Hiragino Sans', 'IPAexGothic']
-plt.rcParams['axes.unicode_minus'] = False
+import threading
+import time
+
+from tracker_core import STOPPED, TrackerCore
+from worklog_store import journal_path_for, warm_up
+
+# matplotlib / tkcalendar は 📊 を初めて押したときに読み込む（load_analysis_modules）
+AnalysisChart = None
+DateEntry = None
+HAS_CALENDAR = False
+
+
+def load_analysis_modules():
+    global AnalysisChart, DateEntry, HAS_CALENDAR
+    if AnalysisChart is not None:
+        return
+    import matplotlib
+    matplotlib.use('TkAgg')
+    # 日本語フォント設定
+    matplotlib.rcParams['font.sans-serif'] = ['Yu Gothic', 'MS Gothic', 'Hiragino Sans', 'IPAexGothic']
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    try:
+        from tkcalendar import DateEntry
+        HAS_CALENDAR = True
+    except ImportError:
+        HAS_CALENDAR = False
+    from analysis_chart import AnalysisChart
 
 # ==========================================
 # strat-lab システム専用パス固定定義
 # ==========================================
 SETTINGS_FILE = r"C:\Users\akasaka.kazuyuki\OneDrive - ユーザーサイド株式会社\strat-lab\strat-lab\70_Frameworks\74_AI_Systems\74_1_Tools_Settings\configs/tracker_settings.json"
-DEFAULT_LOG_FILE = 'work_log.xlsx'
 FIXED_OUTPUT_DIR = r"C:\Users\akasaka.kazuyuki\OneDrive - ユーザーサイド株式会社\strat-lab\strat-lab\10_Daily\11_工数管理\Pythonログ"
+# 操作を記録するファイル（tracker_core.py replay で再生できる）。None なら記録しない
+EVENT_LOG_FILE = None
+# 書き込みスレッドの状態を確認する間隔
+WRITER_POLL_MS = 500
+# 設定変更はこの時間操作が止まってからまとめて保存する
+SETTINGS_SAVE_DELAY_MS = 1500
+# 終了時に設定の保存が PermissionError になったときの再試行間隔（秒。終了後は after() が動かないのでその場で待つ）
+CLOSE_RETRY_DELAYS = (0.5, 1, 2)
+# 画面表示後、openpyxl をバックグラウンドで先読みするまでの待ち時間
+WARM_UP_DELAY_MS = 1000
 
 class ModernTracker:
     def __init__(self, root):
@@ -41,64 +56,78 @@ class ModernTracker:
         self.root.attributes("-topmost", True)
         self.root.configure(bg="#1a1a2e")
 
-        self.current_task = tk.StringVar(value="停止中")
-        self.current_memo = ""
-        self.start_time = None
-        self.groups = {}
+        # 記録・設定・集計は TrackerCore が持つ。ここは画面との橋渡しだけ
+        self.core = TrackerCore(SETTINGS_FILE, FIXED_OUTPUT_DIR, events_path=EVENT_LOG_FILE)
+        self.current_task = tk.StringVar(value=STOPPED)
         self.expanded_groups = {}
-        self.output_dir = FIXED_OUTPUT_DIR
+        # グループ名 → そのグループのウィジェット（refresh_buttons で差分だけ更新する）
+        self.group_rows = {}
+        self.settings_job = None
+        self.pending_var = tk.StringVar(value="")
 
         self.load_settings()
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        # 前回異常終了で残ったジャーナルを取り込む
+        self.core.get_writer().request_compact()
+        self.root.after(WRITER_POLL_MS, self.poll_writer)
+        self.root.after(WARM_UP_DELAY_MS, lambda: threading.Thread(target=warm_up, daemon=True).start())
+
+    @property
+    def groups(self):
+        return self.core.groups
+
+    @property
+    def output_dir(self):
+        return self.core.output_dir
 
     def load_settings(self):
-        os.makedirs(os.path.dirname(SETTINGS_FILE), exist_ok=True)
-        os.makedirs(self.output_dir, exist_ok=True)
-        
-        default = {
-            "groups": {
-                "メイン業務": ["電話対応", "事務処理", "会議", "資料作成"],
-                "その他": ["休憩", "移動", "雑務"]
-            },
-            "output_dir": self.output_dir
-        }
-        
-        if os.path.exists(SETTINGS_FILE):
-            with open(SETTINGS_FILE, 'r', encoding='utf_8') as f:
-                settings = json.load(f)
-                if "groups" in settings:
-                    self.groups = settings["groups"]
-                    self.output_dir = FIXED_OUTPUT_DIR
-                else:
-                    self.groups = settings
-                    self.output_dir = FIXED_OUTPUT_DIR
-        else:
-            self.groups = default["groups"]
-            self.output_dir = FIXED_OUTPUT_DIR
+        if not self.core.load_settings():
             self.save_settings()
-        
         for group in self.groups.keys():
             self.expanded_groups[group] = True
 
     def save_settings(self):
-        settings = {
-            "groups": self.groups,
-            "output_dir": self.output_dir
-        }
-        with open(SETTINGS_FILE, 'w', encoding='utf_8') as f:
-            json.dump(settings, f, ensure_ascii=False, indent=4)
-    
-    def get_log_file_path(self):
-        return os.path.join(self.output_dir, DEFAULT_LOG_FILE)
-    
-    def parse_date_safe(self, date_str):
-        if not date_str or not str(date_str).strip(): return None
-        date_str = str(date_str).strip()
-        for fmt in ("%Y/%m/%d", "%Y-%m-%d", "%Y/%m/%d %H:%M:%S"):
-            try: return datetime.strptime(date_str.split()[0], fmt.split()[0]).date()
-            except: continue
-        return None
+        # 並べ替えの連打などは最後の変更から少し待って1回だけ書き込む
+        if self.settings_job is not None:
+            self.root.after_cancel(self.settings_job)
+        self.settings_job = self.root.after(SETTINGS_SAVE_DELAY_MS, self.flush_settings)
+
+    def flush_settings(self, closing=False):
+        if self.settings_job is not None:
+            self.root.after_cancel(self.settings_job)
+            self.settings_job = None
+        for delay in (0,) + (CLOSE_RETRY_DELAYS if closing else ()):
+            time.sleep(delay)
+            try:
+                self.core.write_settings()
+                return
+            except PermissionError:
+                continue
+        if closing:
+            messagebox.showwarning("保存失敗", f"設定を保存できませんでした:\n{self.core.settings_path}")
+        else:
+            # OneDrive同期中など。少し待って再試行
+            self.save_settings()
 
+    def edited(self, changed):
+        # TrackerCore の編集操作の後に呼ぶ。変更があったときだけ保存・再描画
+        if changed:
+            self.save_settings(); self.refresh_buttons()
+
+    def poll_writer(self):
+        writer = self.core.writer
+        status = writer.status if writer else {"pending": 0, "state": "idle"}
+        if status["state"] == "locked":
+            self.pending_var.set(f"🔒{status['pending']}")
+            self.pending_label.configure(fg="#f59e0b")
+        elif status["pending"]:
+            self.pending_var.set(f"💾{status['pending']}")
+            self.pending_label.configure(fg="#64748b")
+        else:
+            self.pending_var.set("")
+        self.root.after(WRITER_POLL_MS, self.poll_writer)
+    
     def setup_ui(self):
         status_frame = tk.Frame(self.root, bg="#16213e", bd=0, relief="flat")
         status_frame.pack(fill="x", padx=0, pady=0)
@@ -115,6 +144,10 @@ class ModernTracker:
         memo_btn = tk.Button(status_inner, text="📝", width=3, command=self.add_memo, bg="#0f172a", fg="#f1f5f9", activebackground="#1e293b", relief="flat", font=("Yu Gothic", 10), cursor="hand2", borderwidth=0, highlightthickness=0, pady=2)
         memo_btn.pack(side="right", padx=2)
 
+        # Excel未反映の件数（🔒はファイルがロックされて再試行中）
+        self.pending_label = tk.Label(status_inner, textvariable=self.pending_var, bg="#16213e", fg="#64748b", font=("Yu Gothic", 8))
+        self.pending_label.pack(side="right", padx=4)
+
         bottom_frame = tk.Frame(self.root, bg="#1a1a2e")
         bottom_frame.pack(side="bottom", fill="x", padx=8, pady=5)
         
@@ -150,172 +183,200 @@ class ModernTracker:
         self.refresh_buttons()
 
     def refresh_buttons(self):
-        for widget in self.scroll_frame.winfo_children(): widget.destroy()
+        # 変化したグループ・タスクの行だけ作成・削除・再配置する（毎回すべて作り直さない）
+        self.scroll_frame.grid_columnconfigure(0, weight=1)
         group_list = list(self.groups.keys())
+        for group in list(self.group_rows):
+            if group not in self.groups:
+                row = self.group_rows.pop(group)
+                row["header"].destroy()
+                if row["container"] is not None: row["container"].destroy()
+
         for group_idx, group in enumerate(group_list):
-            tasks = self.groups[group]
-            header_frame = tk.Frame(self.scroll_frame, bg="#0f172a", bd=0, relief="flat")
-            header_frame.pack(fill="x", padx=4, pady=6)
-            header_inner = tk.Frame(header_frame, bg="#0f172a")
-            header_inner.pack(fill="x", padx=10, pady=8)
-            
-            arrow_frame = tk.Frame(header_inner, bg="#0f172a")
-            arrow_frame.pack(side="left", padx=(0, 8))
-            if group_idx > 0:
-                tk.Button(arrow_frame, text="▲", width=1, command=lambda g=group: self.move_group_up(g), bg="#1e293b", fg="#94a3b8", relief="flat", font=("Yu Gothic", 7), borderwidth=0).pack(side="top", pady=(0, 1))
-            if group_idx < len(group_list) - 1:
-                tk.Button(arrow_frame, text="▼", width=1, command=lambda g=group: self.move_group_down(g), bg="#1e293b", fg="#94a3b8", relief="flat", font=("Yu Gothic", 7), borderwidth=0).pack(side="top")
-
-            toggle_symbol = "▼" if self.expanded_groups.get(group, True) else "▶"
-            tk.Button(header_inner, text=toggle_symbol, width=2, command=lambda g=group: self.toggle_group(g), bg="#0f172a", fg="#cbd5e1", relief="flat", font=("Yu Gothic", 9), borderwidth=0).pack(side="left", padx=(0, 8))
-            tk.Label(header_inner, text=group, bg="#0f172a", fg="#f1f5f9", font=("Yu Gothic", 10, "bold")).pack(side="left")
-
-            btn_frame = tk.Frame(header_inner, bg="#0f172a")
-            btn_frame.pack(side="right")
-            tk.Button(btn_frame, text="✎", width=2, command=lambda g=group: self.edit_group_name(g), bg="#0f172a", fg="#64748b", relief="flat", font=("Yu Gothic", 10), borderwidth=0).pack(side="left", padx=2)
-            tk.Button(btn_frame, text="×", width=2, command=lambda g=group: self.delete_group(g), bg="#0f172a", fg="#ef4444", relief="flat", font=("Yu Gothic", 11), borderwidth=0).pack(side="left", padx=2)
-            tk.Button(btn_frame, text="+", width=2, command=lambda g=group: self.add_task(g), bg="#0f172a", fg="#10b981", relief="flat", font=("Yu Gothic", 11), borderwidth=0).pack(side="left", padx=2)
-
-            if self.expanded_groups.get(group, True):
-                task_container = tk.Frame(self.scroll_frame, bg="#1a1a2e")
-                task_container.pack(fill="x", padx=4, pady=(0, 4))
-                for task_idx, task in enumerate(tasks):
-                    row, col = task_idx // 2, task_idx % 2
-                    task_cell = tk.Frame(task_container, bg="#1a1a2e")
-                    task_cell.grid(row=row, column=col, padx=3, pady=2, sticky="ew")
-                    task_container.grid_columnconfigure(col, weight=1)
-                    
-                    task_arrow_frame = tk.Frame(task_cell, bg="#1a1a2e")
-                    task_arrow_frame.pack(side="left", padx=(2, 4))
-                    if task_idx > 0:
-                        tk.Button(task_arrow_frame, text="▲", width=1, command=lambda g=group, t=task: self.move_task_up(g, t), bg="#1e293b", fg="#64748b", relief="flat", font=("Yu Gothic", 6), borderwidth=0).pack(side="top", pady=(0, 1))
-                    if task_idx < len(tasks) - 1:
-                        tk.Button(task_arrow_frame, text="▼", width=1, command=lambda g=group, t=task: self.move_task_down(g, t), bg="#1e293b", fg="#64748b", relief="flat", font=("Yu Gothic", 6), borderwidth=0).pack(side="top")
-
-                    tk.Button(task_cell, text=task, anchor="w", command=lambda t=task: self.switch_task(t), bg="#16213e", fg="#e2e8f0", relief="flat", font=("Yu Gothic", 9), padx=8, pady=7, borderwidth=0).pack(side="left", fill="both", expand=True)
-                    action_f = tk.Frame(task_cell, bg="#16213e")
-                    action_f.pack(side="left", padx=2)
-                    tk.Button(action_f, text="✎", width=2, command=lambda g=group, t=task: self.edit_task(g, t), bg="#16213e", fg="#64748b", relief="flat", borderwidth=0).pack(side="left")
-                    tk.Button(action_f, text="×", width=2, command=lambda g=group, t=task: self.delete_task(g, t), bg="#16213e", fg="#ef4444", relief="flat", borderwidth=0).pack(side="left")
+            row = self.group_rows.get(group) or self.build_group_row(group)
+            self.grid_if_moved(row, "header", row=group_idx * 2, column=0, padx=4, pady=6, sticky="ew")
+            self.sync_arrows(row, group_idx > 0, group_idx < len(group_list) - 1,
+                lambda g=group: tk.Button(row["arrow_frame"], text="▲", width=1, command=lambda: self.move_group_up(g), bg="#1e293b", fg="#94a3b8", relief="flat", font=("Yu Gothic", 7), borderwidth=0),
+                lambda g=group: tk.Button(row["arrow_frame"], text="▼", width=1, command=lambda: self.move_group_down(g), bg="#1e293b", fg="#94a3b8", relief="flat", font=("Yu Gothic", 7), borderwidth=0))
+
+            expanded = self.expanded_groups.get(group, True)
+            row["toggle"].configure(text="▼" if expanded else "▶")
+            if expanded:
+                # 折りたたまれている間はタスクのウィジェットを作らない
+                if row["container"] is None:
+                    row["container"] = tk.Frame(self.scroll_frame, bg="#1a1a2e")
+                self.grid_if_moved(row, "container", row=group_idx * 2 + 1, column=0, padx=4, pady=(0, 4), sticky="ew")
+                self.refresh_tasks(group, row)
+            elif row["container"] is not None and row["positions"].get("container") is not None:
+                row["container"].grid_remove()
+                row["positions"]["container"] = None
+
+    def build_group_row(self, group):
+        header_frame = tk.Frame(self.scroll_frame, bg="#0f172a", bd=0, relief="flat")
+        header_inner = tk.Frame(header_frame, bg="#0f172a")
+        header_inner.pack(fill="x", padx=10, pady=8)
+        
+        arrow_frame = tk.Frame(header_inner, bg="#0f172a")
+        arrow_frame.pack(side="left", padx=(0, 8))
+
+        toggle_btn = tk.Button(header_inner, text="▼", width=2, command=lambda g=group: self.toggle_group(g), bg="#0f172a", fg="#cbd5e1", relief="flat", font=("Yu Gothic", 9), borderwidth=0)
+        toggle_btn.pack(side="left", padx=(0, 8))
+        tk.Label(header_inner, text=group, bg="#0f172a", fg="#f1f5f9", font=("Yu Gothic", 10, "bold")).pack(side="left")
+
+        btn_frame = tk.Frame(header_inner, bg="#0f172a")
+        btn_frame.pack(side="right")
+        tk.Button(btn_frame, text="✎", width=2, command=lambda g=group: self.edit_group_name(g), bg="#0f172a", fg="#64748b", relief="flat", font=("Yu Gothic", 10), borderwidth=0).pack(side="left", padx=2)
+        tk.Button(btn_frame, text="×", width=2, command=lambda g=group: self.delete_group(g), bg="#0f172a", fg="#ef4444", relief="flat", font=("Yu Gothic", 11), borderwidth=0).pack(side="left", padx=2)
+        tk.Button(btn_frame, text="+", width=2, command=lambda g=group: self.add_task(g), bg="#0f172a", fg="#10b981", relief="flat", font=("Yu Gothic", 11), borderwidth=0).pack(side="left", padx=2)
+
+        row = {"header": header_frame, "arrow_frame": arrow_frame, "up": None, "down": None, "toggle": toggle_btn,
+               "container": None, "tasks": {}, "positions": {}}
+        self.group_rows[group] = row
+        return row
+
+    def refresh_tasks(self, group, row):
+        tasks = self.groups[group]
+        cells = row["tasks"]
+        for task in list(cells):
+            if task not in tasks:
+                cells.pop(task)["cell"].destroy()
+
+        for task_idx, task in enumerate(tasks):
+            cell = cells.get(task) or self.build_task_cell(group, task, row["container"])
+            r, col = task_idx // 2, task_idx % 2
+            if cell["positions"].get("cell") != (r, col):
+                row["container"].grid_columnconfigure(col, weight=1)
+            self.grid_if_moved(cell, "cell", row=r, column=col, padx=3, pady=2, sticky="ew")
+            self.sync_arrows(cell, task_idx > 0, task_idx < len(tasks) - 1,
+                lambda g=group, t=task: tk.Button(cell["arrow_frame"], text="▲", width=1, command=lambda: self.move_task_up(g, t), bg="#1e293b", fg="#64748b", relief="flat", font=("Yu Gothic", 6), borderwidth=0),
+                lambda g=group, t=task: tk.Button(cell["arrow_frame"], text="▼", width=1, command=lambda: self.move_task_down(g, t), bg="#1e293b", fg="#64748b", relief="flat", font=("Yu Gothic", 6), borderwidth=0))
+
+    def build_task_cell(self, group, task, container):
+        task_cell = tk.Frame(container, bg="#1a1a2e")
+        
+        task_arrow_frame = tk.Frame(task_cell, bg="#1a1a2e")
+        task_arrow_frame.pack(side="left", padx=(2, 4))
+
+        tk.Button(task_cell, text=task, anchor="w", command=lambda t=task: self.switch_task(t), bg="#16213e", fg="#e2e8f0", relief="flat", font=("Yu Gothic", 9), padx=8, pady=7, borderwidth=0).pack(side="left", fill="both", expand=True)
+        action_f = tk.Frame(task_cell, bg="#16213e")
+        action_f.pack(side="left", padx=2)
+        tk.Button(action_f, text="✎", width=2, command=lambda g=group, t=task: self.edit_task(g, t), bg="#16213e", fg="#64748b", relief="flat", borderwidth=0).pack(side="left")
+        tk.Button(action_f, text="×", width=2, command=lambda g=group, t=task: self.delete_task(g, t), bg="#16213e", fg="#ef4444", relief="flat", borderwidth=0).pack(side="left")
+
+        cell = {"cell": task_cell, "arrow_frame": task_arrow_frame, "up": None, "down": None, "positions": {}}
+        self.group_rows[group]["tasks"][task] = cell
+        return cell
+
+    def grid_if_moved(self, entry, key, row, column, **options):
+        # 位置が変わったときだけ grid し直す
+        if entry["positions"].get(key) != (row, column):
+            entry[key].grid(row=row, column=column, **options)
+            entry["positions"][key] = (row, column)
+
+    def sync_arrows(self, entry, has_up, has_down, make_up, make_down):
+        # ▲/▼ は先頭・末尾かどうかが変わったときだけ作成・削除する
+        if has_up and entry["up"] is None:
+            entry["up"] = make_up()
+            if entry["down"] is not None:
+                entry["up"].pack(side="top", pady=(0, 1), before=entry["down"])
+            else:
+                entry["up"].pack(side="top", pady=(0, 1))
+        elif not has_up and entry["up"] is not None:
+            entry["up"].destroy(); entry["up"] = None
+        if has_down and entry["down"] is None:
+            entry["down"] = make_down()
+            entry["down"].pack(side="top")
+        elif not has_down and entry["down"] is not None:
+            entry["down"].destroy(); entry["down"] = None
 
     def move_group_up(self, group):
-        gl = list(self.groups.keys()); idx = gl.index(group)
-        if idx > 0:
-            gl[idx], gl[idx-1] = gl[idx-1], gl[idx]
-            self.groups = {g: self.groups[g] for g in gl}; self.save_settings(); self.refresh_buttons()
+        self.edited(self.core.move_group(group, -1))
 
     def move_group_down(self, group):
-        gl = list(self.groups.keys()); idx = gl.index(group)
-        if idx < len(gl)-1:
-            gl[idx], gl[idx+1] = gl[idx+1], gl[idx]
-            self.groups = {g: self.groups[g] for g in gl}; self.save_settings(); self.refresh_buttons()
+        self.edited(self.core.move_group(group, 1))
 
     def move_task_up(self, group, task):
-        idx = self.groups[group].index(task)
-        if idx > 0:
-            self.groups[group][idx], self.groups[group][idx-1] = self.groups[group][idx-1], self.groups[group][idx]
-            self.save_settings(); self.refresh_buttons()
+        self.edited(self.core.move_task(group, task, -1))
 
     def move_task_down(self, group, task):
-        idx = self.groups[group].index(task)
-        if idx < len(self.groups[group])-1:
-            self.groups[group][idx], self.groups[group][idx+1] = self.groups[group][idx+1], self.groups[group][idx]
-            self.save_settings(); self.refresh_buttons()
+        self.edited(self.core.move_task(group, task, 1))
 
     def toggle_group(self, group):
         self.expanded_groups[group] = not self.expanded_groups.get(group, True); self.refresh_buttons()
 
     def add_group(self):
-        name = simpledialog.askstring("追加", "グループ名:"); 
-        if name and name not in self.groups: self.groups[name] = []; self.expanded_groups[name] = True; self.save_settings(); self.refresh_buttons()
+        name = simpledialog.askstring("追加", "グループ名:")
+        if self.core.add_group(name): self.expanded_groups[name] = True; self.edited(True)
 
     def edit_group_name(self, old):
         new = simpledialog.askstring("編集", "新グループ名:", initialvalue=old)
-        if new and new != old:
-            new_g = {}; [new_g.update({(new if k==old else k): v}) for k,v in self.groups.items()]
-            self.groups = new_g; self.expanded_groups[new] = self.expanded_groups.pop(old, True); self.save_settings(); self.refresh_buttons()
+        if self.core.rename_group(old, new): self.expanded_groups[new] = self.expanded_groups.pop(old, True); self.edited(True)
 
     def delete_group(self, group):
-        if messagebox.askyesno("確認", f"「{group}」を削除？"): del self.groups[group]; self.save_settings(); self.refresh_buttons()
+        if messagebox.askyesno("確認", f"「{group}」を削除？"): self.edited(self.core.delete_group(group))
 
     def add_task(self, group):
         name = simpledialog.askstring("追加", f"「{group}」の新タスク:")
-        if name and name not in self.groups[group]: self.groups[group].append(name); self.save_settings(); self.refresh_buttons()
+        self.edited(self.core.add_task(group, name))
 
     def edit_task(self, group, old):
         new = simpledialog.askstring("編集", "新タスク名:", initialvalue=old)
-        if new and new != old: idx = self.groups[group].index(old); self.groups[group][idx] = new; self.save_settings(); self.refresh_buttons()
+        self.edited(self.core.rename_task(group, old, new))
 
     def delete_task(self, group, task):
-        if messagebox.askyesno("確認", f"「{task}」を削除？"): self.groups[group].remove(task); self.save_settings(); self.refresh_buttons()
+        if messagebox.askyesno("確認", f"「{task}」を削除？"): self.edited(self.core.delete_task(group, task))
 
     def add_memo(self):
-        if self.current_task.get() == "停止中": return
-        m = simpledialog.askstring("メモ", f"「{self.current_task.get()}」のメモ:", initialvalue=self.current_memo)
-        if m is not None: self.current_memo = m
+        if not self.core.is_running(): return
+        m = simpledialog.askstring("メモ", f"「{self.core.current_task}」のメモ:", initialvalue=self.core.current_memo)
+        if m is not None: self.core.set_memo(m)
 
     def switch_task(self, name):
-        now = datetime.now()
-        if self.current_task.get() != "停止中": self.save_log(self.current_task.get(), self.start_time, now, self.current_memo)
-        self.current_task.set(name); self.current_memo = ""; self.start_time = now
+        self.core.switch(name); self.current_task.set(self.core.current_task)
 
     def complete_day(self):
-        if self.current_task.get() != "停止中":
+        if self.core.is_running():
             if messagebox.askyesno("確認", "完了しますか？"):
-                self.save_log(self.current_task.get(), self.start_time, datetime.now(), self.current_memo)
-                self.current_task.set("停止中"); self.current_memo = ""; self.start_time = None
-                messagebox.showinfo("完了", f"保存先:\n{self.get_log_file_path()}")
+                self.core.complete(); self.current_task.set(self.core.current_task)
+                messagebox.showinfo("完了", f"保存先:\n{self.core.get_log_file_path()}")
 
     def open_output_folder(self):
         if os.path.exists(self.output_dir): os.startfile(self.output_dir)
 
     def change_output_folder(self):
         new = filedialog.askdirectory(title="保存先選択", initialdir=self.output_dir)
-        if new: self.output_dir = new; self.save_settings(); messagebox.showinfo("変更", f"保存先:\n{new}")
-
-    def save_log(self, task, start, end, memo=""):
-        dur = round((end - start).total_seconds() / 60, 1)
-        path = self.get_log_file_path()
-        
-        if os.path.exists(path):
-            wb = load_workbook(path)
-            ws = wb.active
-            
-            if ws.tables:
-                for table_name in list(ws.tables.keys()):
-                    del ws.tables[table_name]
-        else:
-            wb = Workbook()
-            ws = wb.active
-            ws.append(["日付", "開始", "終了", "タスク", "分", "メモ"])
-        
-        next_row = ws.max_row + 1
-        ws.append([
-            start.strftime("%Y/%m/%d"),
-            start.strftime("%H:%M"),
-            end.strftime("%H:%M"),
-            task,
-            dur,
-            memo
-        ])
-        
-        table_range = f"A1:F{ws.max_row}"
-        table = Table(displayName="WorkLog", ref=table_range)
-        style = TableStyleInfo(
-            name="TableStyleMedium9",
-            showFirstColumn=False,
-            showLastColumn=False,
-            showRowStripes=True,
-            showColumnStripes=False
-        )
-        table.tableStyleInfo = style
-        ws.add_table(table)
-        
-        wb.save(path)
+        if new: self.core.set_output_dir(new); self.save_settings(); messagebox.showinfo("変更", f"保存先:\n{new}")
+
+    def on_close(self):
+        self.root.withdraw()
+        self.flush_settings(closing=True)
+        self.core.close()
+        self.root.destroy()
+
+    def resolve_period(self, mode, start_cal, end_cal, latest_date):
+        # 表示モード → (開始日, 終了日, タイトル)。開始日・終了日が None なら全期間
+        if mode == "daily":
+            target_date = start_cal.get_date() if HAS_CALENDAR and start_cal else latest_date
+            return target_date, target_date, f"({target_date})"
+        if mode == "range" and HAS_CALENDAR and start_cal and end_cal:
+            start_date = start_cal.get_date()
+            end_date = end_cal.get_date()
+            return start_date, end_date, f"({start_date} 〜 {end_date})"
+        return None, None, "(全期間)"
+
+    def aggregate(self, summary, mode, start_cal, end_cal):
+        # SQLite（インデックス付きSQL）か日付×タスクの集計キャッシュから必要な期間だけ合計する
+        latest_date = summary.latest_date()
+        if latest_date is None:
+            return None
+        start_date, end_date, title_suffix = self.resolve_period(mode, start_cal, end_cal, latest_date)
+        return summary.task_totals(start_date, end_date), title_suffix
 
     def open_analysis(self):
-        log_path = self.get_log_file_path()
-        if not os.path.exists(log_path):
+        load_analysis_modules()
+        # Excelへの取り込みは待たない（集計キャッシュ・SQLiteはジャーナル分も反映済み）
+        log_path = self.core.get_log_file_path()
+        if not os.path.exists(log_path) and not os.path.exists(journal_path_for(log_path)):
             messagebox.showwarning("データなし", "ログファイルが見つかりません")
             return
         
@@ -350,123 +411,41 @@ class ModernTracker:
             end_cal = DateEntry(control_frame, width=12, background='#3b82f6', foreground='white', borderwidth=2, date_pattern='y/mm/dd', locale='ja_JP')
             end_cal.pack(side="left", padx=5)
         
+        def show_message(text):
+            chart.widget.pack_forget()
+            message_label.configure(text=text)
+            message_label.pack(expand=True)
+        
         def refresh_analysis():
-            for w in chart_frame.winfo_children(): w.destroy()
-            
             mode = mode_var.get()
             
-            wb = load_workbook(log_path)
-            ws = wb.active
-            data = []
+            summary = self.core.open_summary()
+            try:
+                result = self.aggregate(summary, mode, start_cal, end_cal)
+            finally:
+                summary.close()
             
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if row[0]:
-                    row_date = self.parse_date_safe(row[0])
-                    if row_date:
-                        data.append({
-                            "日付": row_date,
-                            "タスク": row[3],
-                            "分": float(row[4]) if row[4] else 0
-                        })
-            
-            if not data:
-                tk.Label(chart_frame, text="データがありません", bg="#1a1a2e", fg="#94a3b8", font=("Yu Gothic", 12)).pack(expand=True)
+            if result is None:
+                show_message("データがありません")
                 return
             
-            # モードに応じてデータをフィルタ
-            if mode == "daily":
-                if HAS_CALENDAR and start_cal:
-                    target_date = start_cal.get_date()
-                    filtered_data = [d for d in data if d["日付"] == target_date]
-                    title_suffix = f"({target_date})"
-                else:
-                    latest_date = max([d["日付"] for d in data])
-                    filtered_data = [d for d in data if d["日付"] == latest_date]
-                    title_suffix = f"({latest_date})"
-            elif mode == "range":
-                if HAS_CALENDAR and start_cal and end_cal:
-                    start_date = start_cal.get_date()
-                    end_date = end_cal.get_date()
-                    filtered_data = [d for d in data if start_date <= d["日付"] <= end_date]
-                    title_suffix = f"({start_date} 〜 {end_date})"
-                else:
-                    filtered_data = data
-                    title_suffix = "(全期間)"
-            else:  # all
-                filtered_data = data
-                title_suffix = "(全期間)"
-            
-            if not filtered_data:
-                tk.Label(chart_frame, text="指定期間にデータがありません", bg="#1a1a2e", fg="#94a3b8", font=("Yu Gothic", 12)).pack(expand=True)
+            task_time, title_suffix = result
+            if not task_time:
+                show_message("指定期間にデータがありません")
                 return
             
-            # タスク別集計
-            task_time = defaultdict(float)
-            for row in filtered_data:
-                task_time[row["タスク"]] += row["分"]
-            
-            # カラーパレット（視認性の高い色）
-            distinct_colors = [
-                '#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8',
-                '#F7DC6F', '#BB8FCE', '#85C1E2', '#F8B739', '#52B788',
-                '#E07A5F', '#81B29A', '#F2CC8F', '#A8DADC', '#E63946'
-            ]
-            
-            # 2つのグラフ表示
-            fig = plt.Figure(figsize=(12, 5), facecolor='#1a1a2e')
-            
-            # 1. タスク別工数（横棒グラフ）
-            ax1 = fig.add_subplot(121, facecolor='#16213e')
-            tasks = list(task_time.keys())
-            times = [task_time[t]/60 for t in tasks]
-            colors = [distinct_colors[i % len(distinct_colors)] for i in range(len(tasks))]
-            ax1.barh(tasks, times, color=colors)
-            ax1.set_xlabel('時間 (h)', color='#f1f5f9', fontsize=11)
-            ax1.set_title(f'タスク別工数 {title_suffix}', color='#f1f5f9', fontweight='bold', fontsize=13)
-            ax1.tick_params(colors='#f1f5f9', labelsize=10)
-            ax1.spines['bottom'].set_color('#94a3b8')
-            ax1.spines['left'].set_color('#94a3b8')
-            ax1.spines['top'].set_visible(False)
-            ax1.spines['right'].set_visible(False)
-            ax1.grid(axis='x', color='#2d3748', linestyle='--', linewidth=0.5, alpha=0.7)
-            
-            # 2. タスク別工数（円グラフ）
-            ax2 = fig.add_subplot(122, facecolor='#16213e')
-            sizes = [task_time[t]/60 for t in tasks]
-            
-            def autopct_format(pct):
-                return f'{pct:.1f}%' if pct > 3 else ''
-            
-            wedges, texts, autotexts = ax2.pie(
-                sizes, 
-                labels=tasks, 
-                autopct=autopct_format,
-                colors=colors,
-                textprops={'color': '#ffffff', 'fontsize': 10, 'weight': 'bold'},
-                startangle=90,
-                pctdistance=0.85
-            )
-            
-            for autotext in autotexts:
-                autotext.set_color('#000000')
-                autotext.set_fontsize(11)
-                autotext.set_weight('bold')
-            
-            for text in texts:
-                text.set_fontsize(9)
-            
-            ax2.set_title(f'タスク割合 {title_suffix}', color='#f1f5f9', fontweight='bold', fontsize=13)
-            
-            fig.tight_layout()
-            
-            canvas = FigureCanvasTkAgg(fig, chart_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=10)
+            # 既存の Figure / Canvas を使い回して中身だけ書き換える
+            message_label.pack_forget()
+            chart.update(task_time, title_suffix)
+            if not chart.widget.winfo_ismapped():
+                chart.widget.pack(fill="both", expand=True, padx=10, pady=10)
         
         tk.Button(control_frame, text="更新", command=refresh_analysis, bg="#3b82f6", fg="white", font=("Yu Gothic", 10, "bold"), relief="flat", padx=15, pady=5, cursor="hand2", borderwidth=0).pack(side="left", padx=10)
         
         chart_frame = tk.Frame(analysis_win, bg="#1a1a2e")
         chart_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        chart = AnalysisChart(chart_frame)
+        message_label = tk.Label(chart_frame, text="", bg="#1a1a2e", fg="#94a3b8", font=("Yu Gothic", 12))
         
         refresh_analysis()
 
@@ -0,0 +1,134 @@
+# analysis_chart.py
+# 工数分析ウィンドウのグラフ（横棒 + 円）。
+# Figure と Canvas は1回だけ作り、更新時は既存の棒・扇形・ラベルを書き換えて draw_idle する。
+
+import math
+
+from matplotlib.figure import Figure
+from matplotlib.patches import Wedge
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+# ==================== 設定 ====================
+
+# これを超えるタスクは上位だけ残して「その他」にまとめる（描画コストを一定に保つ）
+MAX_CHART_TASKS = 12
+OTHER_LABEL = "その他"
+
+# カラーパレット（視認性の高い色）
+DISTINCT_COLORS = [
+    '#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8',
+    '#F7DC6F', '#BB8FCE', '#85C1E2', '#F8B739', '#52B788',
+    '#E07A5F', '#81B29A', '#F2CC8F', '#A8DADC', '#E63946'
+]
+
+PIE_START_ANGLE = 90
+PIE_LABEL_DISTANCE = 1.1
+PIE_PCT_DISTANCE = 0.85
+
+
+def bucket_tasks(task_time, limit=MAX_CHART_TASKS):
+    # [(タスク, 分), ...]。多すぎる場合は上位 limit-1 件（元の並び順のまま）+「その他」
+    items = list(task_time.items())
+    if len(items) <= limit:
+        return items
+    keep = set(sorted(task_time, key=task_time.get, reverse=True)[:limit - 1])
+    top = [(t, m) for t, m in items if t in keep]
+    other = sum(m for t, m in items if t not in keep)
+    return top + [(OTHER_LABEL, other)]
+
+
+def autopct_format(pct):
+    return f'{pct:.1f}%' if pct > 3 else ''
+
+
+# ==================== グラフ ====================
+
+class AnalysisChart:
+
+    def __init__(self, master):
+        self.fig = Figure(figsize=(12, 5), facecolor='#1a1a2e', tight_layout=True)
+
+        # 1. タスク別工数（横棒グラフ）
+        self.ax1 = self.fig.add_subplot(121, facecolor='#16213e')
+        self.ax1.set_xlabel('時間 (h)', color='#f1f5f9', fontsize=11)
+        self.ax1.tick_params(colors='#f1f5f9', labelsize=10)
+        self.ax1.spines['bottom'].set_color('#94a3b8')
+        self.ax1.spines['left'].set_color('#94a3b8')
+        self.ax1.spines['top'].set_visible(False)
+        self.ax1.spines['right'].set_visible(False)
+        self.ax1.grid(axis='x', color='#2d3748', linestyle='--', linewidth=0.5, alpha=0.7)
+        self.bars = list(self.ax1.barh(range(MAX_CHART_TASKS), [0] * MAX_CHART_TASKS))
+        self.title1 = self.ax1.set_title('', color='#f1f5f9', fontweight='bold', fontsize=13)
+
+        # 2. タスク別工数（円グラフ）
+        self.ax2 = self.fig.add_subplot(122, facecolor='#16213e')
+        self.ax2.set(frame_on=False, xticks=[], yticks=[], xlim=(-1.25, 1.25), ylim=(-1.25, 1.25))
+        self.ax2.set_aspect('equal')
+        self.wedges = []
+        self.labels = []
+        self.pcts = []
+        for _ in range(MAX_CHART_TASKS):
+            wedge = Wedge((0, 0), 1, 0, 0, clip_on=False, visible=False)
+            self.ax2.add_patch(wedge)
+            self.wedges.append(wedge)
+            self.labels.append(self.ax2.text(0, 0, '', color='#ffffff', fontsize=9, weight='bold', va='center', clip_on=False))
+            self.pcts.append(self.ax2.text(0, 0, '', color='#000000', fontsize=11, weight='bold', ha='center', va='center'))
+        self.title2 = self.ax2.set_title('', color='#f1f5f9', fontweight='bold', fontsize=13)
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master)
+        self.widget = self.canvas.get_tk_widget()
+
+    def update(self, task_time, title_suffix):
+        items = bucket_tasks(task_time)
+        tasks = [t for t, _ in items]
+        hours = [m / 60 for _, m in items]
+        colors = [DISTINCT_COLORS[i % len(DISTINCT_COLORS)] for i in range(len(items))]
+
+        self._update_bars(tasks, hours, colors)
+        self._update_pie(tasks, hours, colors)
+        self.title1.set_text(f'タスク別工数 {title_suffix}')
+        self.title2.set_text(f'タスク割合 {title_suffix}')
+        self.canvas.draw_idle()
+
+    def _update_bars(self, tasks, hours, colors):
+        n = len(tasks)
+        for i, bar in enumerate(self.bars):
+            if i < n:
+                bar.set_width(hours[i])
+                bar.set_facecolor(colors[i])
+                bar.set_visible(True)
+            else:
+                bar.set_visible(False)
+        self.ax1.set_yticks(range(n))
+        self.ax1.set_yticklabels(tasks)
+        self.ax1.set_ylim(-0.5, max(n, 1) - 0.5)
+        self.ax1.set_xlim(0, (max(hours) if hours else 0) * 1.05 or 1)
+
+    def _update_pie(self, tasks, hours, colors):
+        # ax.pie と同じ配置（startangle=90、反時計回り）を既存の扇形とラベルに反映する
+        total = sum(hours)
+        theta1 = PIE_START_ANGLE / 360
+        for i, wedge in enumerate(self.wedges):
+            label, pct = self.labels[i], self.pcts[i]
+            if i >= len(tasks) or total <= 0:
+                wedge.set_visible(False)
+                label.set_visible(False)
+                pct.set_visible(False)
+                continue
+            frac = hours[i] / total
+            theta2 = theta1 + frac
+            wedge.set_theta1(360 * theta1)
+            wedge.set_theta2(360 * theta2)
+            wedge.set_facecolor(colors[i])
+            wedge.set_visible(True)
+
+            angle = math.pi * (theta1 + theta2)
+            x, y = math.cos(angle), math.sin(angle)
+            label.set_position((PIE_LABEL_DISTANCE * x, PIE_LABEL_DISTANCE * y))
+            label.set_text(tasks[i])
+            label.set_horizontalalignment('left' if x > 0 else 'right')
+            label.set_visible(True)
+            pct.set_position((PIE_PCT_DISTANCE * x, PIE_PCT_DISTANCE * y))
+            pct.set_text(autopct_format(100 * frac))
+            pct.set_visible(True)
+            theta1 = theta2
@@ -4,7 +4,9 @@ import re
 import os
 import sys
 import csv
+import time
 import shutil
+from collections import OrderedDict
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
@@ -48,9 +50,28 @@ PATTERNS = [
     re.compile(r'〒?\d{3}[-‐－]\d{4}'),
     re.compile(r'(北海道|東京都|(?:大阪|京都)府|.{2,3}県).{2,50}(丁目|番地|号|[-\d]+F)'),
 ]
+# PATTERNS のどれかに当たるかを1回の走査で調べる（当たらないセルは置換を5回かけずにそのまま返す）。
+# 置換は1つ前のパターンで置き換えた後の文字列に次をかける（重なったときの結果が変わる）ので、当たったセルだけ順にかける
+ANY_PATTERN = re.compile("|".join(f"(?:{p.pattern})" for p in PATTERNS))
+# 日付・日時・時刻だけのセルはGiNZAが人名・組織名などとして拾わないので、NERを飛ばして正規表現だけにする。
+# （数値や英字を含むコードは '18264'・'K2' のように Person と判定されることがあるので NER に回す）
+NO_NER_VALUE = re.compile(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}(?: \d{1,2}:\d{2}(?::\d{2})?)?|\d{1,2}:\d{2}(?::\d{2})?', re.ASCII)
 
 NER_TARGET_LABELS = {"Person", "GPE", "Location", "Organization", "Facility"}
 
+# nlp.pipe に一度に渡すセル数と、NERを並列に走らせるプロセス数（1ならプロセスを起こさない）
+NER_BATCH_SIZE = 256
+NER_PROCESSES = 1
+# マスク結果を覚えておくセルの値の種類数（古いものから捨てる）
+MASK_CACHE_SIZE = 100_000
+# --stream を付けると .xlsx をストリーミング（読み取り専用で1行ずつ読み、書き込み専用で書く）で処理する。
+# 書式・列幅・結合セルは引き継がれない。付けずにこれより大きいファイルを開いたときは案内だけ出す
+STREAMING_MIN_BYTES = 10 * 1024 * 1024
+# ストリーミング時はマスク結果のキャッシュを文字列のバイト数（目安）でも制限する
+STREAMING_CACHE_BYTES = 16 * 1024 * 1024
+# ストリーミング時に列ごとにまとめてNERへ渡す行数
+STREAMING_CHUNK_ROWS = 1000
+
 # ==================== マスク処理 ====================
 
 def should_mask_header(header):
@@ -67,6 +88,80 @@ def should_truncate_header(header):
     return any(kw in h for kw in TRUNCATE_KEYWORDS)
 
 
+class MaskCache:
+    # セルの文字列 → マスク後の文字列（LRU）。同じ会社名・都道府県・担当者名などは2回目から辞書を引くだけ。
+    # 1回の実行の中ではシート・ファイルをまたいで共有する
+
+    def __init__(self, maxsize=MASK_CACHE_SIZE, maxbytes=None):
+        self.maxsize = maxsize
+        # None なら件数だけで制限する
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text):
+        masked = self.entries.get(text)
+        if masked is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(text)
+        self.hits += 1
+        return masked
+
+    def put(self, text, masked):
+        old = self.entries.get(text)
+        if old is not None:
+            self.nbytes -= entry_bytes(text, old)
+        self.entries[text] = masked
+        self.entries.move_to_end(text)
+        self.nbytes += entry_bytes(text, masked)
+        self.trim()
+
+    def limit_bytes(self, maxbytes):
+        self.maxbytes = maxbytes
+        self.trim()
+
+    def trim(self):
+        while self.entries and (len(self.entries) > self.maxsize
+                                or (self.maxbytes is not None and self.nbytes > self.maxbytes)):
+            text, masked = self.entries.popitem(last=False)
+            self.nbytes -= entry_bytes(text, masked)
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return (f"ヒット {self.hits} / ミス {self.misses}（ヒット率 {rate:.0f}%、"
+                f"保持 {len(self.entries)}件 {self.nbytes / 1024 / 1024:.1f}MB）")
+
+
+def entry_bytes(text, masked):
+    # キャッシュ1件分の文字列のサイズ（辞書自体のオーバーヘッドは含まない）
+    return sys.getsizeof(text) + sys.getsizeof(masked)
+
+
+mask_cache = MaskCache()
+# 経路ごとの [セル数, 秒]（skip: 空欄 / regex: 正規表現のみ / ner: NER + 正規表現（キャッシュ込み）/ route: 振り分け）
+path_stats = {"skip": [0, 0.0], "regex": [0, 0.0], "ner": [0, 0.0], "route": [0, 0.0]}
+
+
+def route(text):
+    # セルの処理経路 "skip" / "regex" / "ner"
+    if not text.strip():
+        return "skip"
+    if not NLP_AVAILABLE or NO_NER_VALUE.fullmatch(text):
+        return "regex"
+    return "ner"
+
+
+def path_summary():
+    (skip, _), (regex, regex_sec), (ner, ner_sec), (_, route_sec) = (
+        path_stats[k] for k in ("skip", "regex", "ner", "route"))
+    return (f"空欄 {skip}件 / 正規表現のみ {regex}件 {regex_sec:.2f}秒 / "
+            f"NER {ner}件 {ner_sec:.2f}秒（振り分け {route_sec:.2f}秒）")
+
+
 def mask_value(value):
     if value is None or str(value).strip() == "":
         return value
@@ -77,6 +172,8 @@ def mask_by_pattern(value):
     if value is None:
         return value
     text = str(value)
+    if ANY_PATTERN.search(text) is None:
+        return text
     for pattern in PATTERNS:
         text = pattern.sub(MASK_VALUE, text)
     return text
@@ -88,7 +185,16 @@ def mask_by_ner(value):
     text = str(value)
     if not text.strip():
         return value
-    doc = nlp(text)
+    if NO_NER_VALUE.fullmatch(text):
+        return mask_by_pattern(text)
+    masked = mask_cache.get(text)
+    if masked is None:
+        masked = mask_entities(text, nlp(text))
+        mask_cache.put(text, masked)
+    return masked
+
+
+def mask_entities(text, doc):
     masked = text
     entities = sorted(doc.ents, key=lambda e: e.start_char, reverse=True)
     for ent in entities:
@@ -97,6 +203,60 @@ def mask_by_ner(value):
     return mask_by_pattern(masked)
 
 
+def mask_values_by_ner(values, batch_size=NER_BATCH_SIZE, n_process=NER_PROCESSES):
+    # 値のリストに mask_by_ner をまとめて適用する（結果は1つずつ呼んだ場合と同じ）。
+    # nlp(text) をセルごとに呼ぶとパイプライン全体の呼び出しコストが毎回かかるので nlp.pipe でバッチにする
+    # 覚えている値はそのまま使い、NERに渡すのは初めて出た値を1回ずつだけ。NER不要な値（route）は正規表現だけ
+    started = time.perf_counter()
+    result = list(values)
+    pending = {}
+    regex_cells = []
+    skipped = 0
+    for i, v in enumerate(values):
+        if v is None:
+            skipped += 1
+            continue
+        text = str(v)
+        path = route(text)
+        if path == "skip":
+            skipped += 1
+            continue
+        if path == "regex":
+            regex_cells.append(i)
+            continue
+        if text in pending:
+            pending[text].append(i)
+            mask_cache.hits += 1
+            continue
+        masked = mask_cache.get(text)
+        if masked is None:
+            pending[text] = [i]
+        else:
+            result[i] = masked
+    routed = time.perf_counter()
+
+    for i in regex_cells:
+        result[i] = mask_by_pattern(values[i])
+    regex_done = time.perf_counter()
+
+    if pending:
+        docs = nlp.pipe(pending, batch_size=batch_size, n_process=n_process)
+        for (text, positions), doc in zip(pending.items(), docs):
+            masked = mask_entities(text, doc)
+            mask_cache.put(text, masked)
+            for i in positions:
+                result[i] = masked
+    ner_done = time.perf_counter()
+
+    path_stats["skip"][0] += skipped
+    path_stats["regex"][0] += len(regex_cells)
+    path_stats["regex"][1] += regex_done - routed
+    path_stats["ner"][0] += len(values) - skipped - len(regex_cells)
+    path_stats["ner"][1] += ner_done - regex_done
+    path_stats["route"][1] += routed - started
+    return result
+
+
 def truncate(value):
     if value is None:
         return value
@@ -110,6 +270,8 @@ def process_xlsx(src_path, dst_path):
     if not OPENPYXL_AVAILABLE:
         raise ImportError("openpyxlがインストールされていません")
 
+    started = time.perf_counter()
+    total = 0
     wb = openpyxl.load_workbook(src_path)
     for ws in wb.worksheets:
         masked_cols = set()
@@ -121,17 +283,89 @@ def process_xlsx(src_path, dst_path):
             if should_truncate_header(header_val):
                 truncate_cols.add(col)
 
-        for row in ws.iter_rows():
+        # NER対象のセルは列ごとに集めてまとめて処理する
+        ner_cells = {}
+        for row in ws.iter_rows(min_row=2):
             for cell in row:
-                if cell.row == 1:
-                    continue
                 if cell.column in masked_cols:
                     cell.value = mask_value(cell.value)
                 else:
-                    cell.value = mask_by_ner(cell.value)
-                if cell.column in truncate_cols and cell.value:
+                    ner_cells.setdefault(cell.column, []).append(cell)
+        for i, (col, cells) in enumerate(sorted(ner_cells.items()), 1):
+            print(f"  処理中... {ws.title} {i}/{len(ner_cells)}列")
+            for cell, value in zip(cells, mask_values_by_ner([c.value for c in cells])):
+                cell.value = value
+
+        for col in truncate_cols:
+            for (cell,) in ws.iter_rows(min_row=2, min_col=col, max_col=col):
+                if cell.value:
                     cell.value = truncate(cell.value)
+        total += max(ws.max_row - 1, 0)
     wb.save(dst_path)
+    report_speed(total, started)
+
+
+def mask_rows(rows, masked_cols, truncate_cols, progress=False):
+    # 値の行（リスト）の並びをその場でマスクする。列番号は0始まり
+    width = max((len(row) for row in rows), default=0)
+    for i in range(width):
+        if progress:
+            print(f"  処理中... {i + 1}/{width}列")
+        cells = [row for row in rows if i < len(row)]
+        if i in masked_cols:
+            values = [mask_value(row[i]) for row in cells]
+        else:
+            values = mask_values_by_ner([row[i] for row in cells])
+        if i in truncate_cols:
+            values = [truncate(v) if v else v for v in values]
+        for row, v in zip(cells, values):
+            row[i] = v
+
+
+def process_xlsx_streaming(src_path, dst_path, chunk_rows=STREAMING_CHUNK_ROWS):
+    # process_xlsx と同じマスクを、シートごと・行ごとに読みながら書き出す（ブック全体をメモリに載せない）。
+    # NERは chunk_rows 行ずつ列ごとにまとめて処理する。
+    # 残るのはキャッシュ（STREAMING_CACHE_BYTES まで）と、openpyxl が読み込み時に丸ごと持つ元ファイルの共有文字列表
+    if not OPENPYXL_AVAILABLE:
+        raise ImportError("openpyxlがインストールされていません")
+
+    mask_cache.limit_bytes(STREAMING_CACHE_BYTES)
+    started = time.perf_counter()
+    total = 0
+    src = openpyxl.load_workbook(src_path, read_only=True)
+    dst = openpyxl.Workbook(write_only=True)
+    try:
+        for ws in src.worksheets:
+            out = dst.create_sheet(title=ws.title)
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            out.append(header)
+            masked_cols = {i for i, h in enumerate(header) if should_mask_header(h)}
+            truncate_cols = {i for i, h in enumerate(header) if should_truncate_header(h)}
+
+            chunk = []
+            for row in rows:
+                chunk.append(list(row))
+                if len(chunk) >= chunk_rows:
+                    mask_rows(chunk, masked_cols, truncate_cols)
+                    for masked in chunk:
+                        out.append(masked)
+                    total += len(chunk)
+                    print(f"  処理中... {ws.title} {total}行")
+                    chunk = []
+            mask_rows(chunk, masked_cols, truncate_cols)
+            for masked in chunk:
+                out.append(masked)
+            total += len(chunk)
+    finally:
+        src.close()
+    # 入力と出力が同じパス（.xls から変換したとき）でも壊さないように一時ファイル経由で保存する
+    tmp = dst_path + ".tmp"
+    dst.save(tmp)
+    os.replace(tmp, dst_path)
+    report_speed(total, started)
 
 
 # ==================== CSV処理 ====================
@@ -156,29 +390,26 @@ def process_csv(src_path, dst_path):
     masked_cols = {i for i, h in enumerate(header) if should_mask_header(h)}
     truncate_cols = {i for i, h in enumerate(header) if should_truncate_header(h)}
 
-    result = [header]
-    total = len(rows) - 1
-    for idx, row in enumerate(rows[1:], 1):
-        if idx % 50 == 0:
-            print(f"  処理中... {idx}/{total}行")
-        new_row = []
-        for i, val in enumerate(row):
-            if i in masked_cols:
-                v = MASK_VALUE if val.strip() else val
-            else:
-                v = mask_by_ner(val)
-            if i in truncate_cols:
-                v = truncate(v)
-            new_row.append(v)
-        result.append(new_row)
+    started = time.perf_counter()
+    body = [list(row) for row in rows[1:]]
+    mask_rows(body, masked_cols, truncate_cols, progress=True)
+    result = [header] + body
+    report_speed(len(body), started)
 
     with open(dst_path, "w", newline="", encoding=used_enc) as f:
         csv.writer(f).writerows(result)
 
 
+def report_speed(rows, started):
+    elapsed = time.perf_counter() - started
+    print(f"⏱ {rows}行 / {elapsed:.1f}秒（{rows / elapsed if elapsed else 0:.0f}行/秒）")
+    print(f"🗂 マスク結果のキャッシュ: {mask_cache.summary()}")
+    print(f"🔀 処理経路: {path_summary()}")
+
+
 # ==================== メイン ====================
 
-def main(file_path=None):
+def main(file_path=None, streaming=False):
     if not file_path:
         root = tk.Tk()
         root.withdraw()
@@ -215,13 +446,18 @@ def main(file_path=None):
 
     try:
         if ext in [".xlsx", ".xls"]:
+            process = process_xlsx_streaming if streaming else process_xlsx
+            if streaming:
+                print("🌊 ストリーミングモード（書式・列幅・結合セルは引き継ぎません）")
+            elif os.path.getsize(file_path) >= STREAMING_MIN_BYTES:
+                print("💡 大きいファイルです。メモリが足りない場合は --stream を付けて実行してください（書式は引き継ぎません）")
             if ext == ".xls":
                 tmp = dst_path.replace(".xls", ".xlsx")
                 shutil.copy2(file_path, tmp)
-                process_xlsx(tmp, tmp)
+                process(tmp, tmp)
                 dst_path = tmp
             else:
-                process_xlsx(file_path, dst_path)
+                process(file_path, dst_path)
         elif ext == ".csv":
             process_csv(file_path, dst_path)
         else:
@@ -239,5 +475,6 @@ def main(file_path=None):
 
 
 if __name__ == "__main__":
-    file_path = sys.argv[1] if len(sys.argv) > 1 else None
-    main(file_path)
\ No newline at end of file
+    # python mask_personal_info.py [--stream] [ファイル]
+    args = [a for a in sys.argv[1:] if a != "--stream"]
+    main(args[0] if args else None, streaming="--stream" in sys.argv[1:])
\ No newline at end of file
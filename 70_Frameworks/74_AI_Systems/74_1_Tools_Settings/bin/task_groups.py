@@ -0,0 +1,21 @@
+# task_groups.py
+# トラッカーの設定ファイル（tracker_settings.json）のグループ分け → {タスク: グループ}。
+# worklog_cube.py（dashboard.py）と window_rules.py が使う。pandas を読み込まないよう標準ライブラリだけで書く。
+
+import json
+
+# ==================== 設定 ====================
+
+# tracker_settings.json のどのグループにも入っていないタスク
+UNGROUPED_LABEL = "未分類"
+
+
+def load_task_groups(settings_path):
+    # {タスク: グループ}（トラッカーの設定ファイルから。無ければ空）
+    try:
+        with open(settings_path, "r", encoding="utf_8") as f:
+            settings = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    groups = settings["groups"] if "groups" in settings else settings
+    return {task: group for group, tasks in groups.items() for task in tasks}
@@ -0,0 +1,336 @@
+# tracker_core.py
+# 工数トラッカーの本体（GUIなし）。FinalTracker_ExcelReady.py（Tk）と dashboard.py はこれを使う。
+# ホットキーやスクリプトからも同じ操作（開始・切り替え・メモ・完了・集計）ができる。
+#
+#   python tracker_core.py replay <events.jsonl> [出力フォルダ]    記録した操作を最速で流して計測
+#   python tracker_core.py replay --from-log <work_log.xlsx> [出力フォルダ]
+#                                                                 既存ログから操作列を組み立てて計測
+
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from worklog_db import WorkLogDB, db_path_for, unsynced_rows
+from worklog_rollup import RollupView, WorkLogRollup
+from worklog_store import PersistenceWorker, WorkLogJournal, load_rows, make_row, normalize_rows
+
+# ==================== 設定 ====================
+
+STOPPED = "停止中"
+DEFAULT_LOG_FILE = 'work_log.xlsx'
+DEFAULT_GROUPS = {
+    "メイン業務": ["電話対応", "事務処理", "会議", "資料作成"],
+    "その他": ["休憩", "移動", "雑務"]
+}
+# 最後の切り替えからこの時間操作がなければジャーナルをExcelへ取り込む
+COMPACT_IDLE_SEC = 10 * 60
+# 終了時にExcelへの取り込みを待つ最大秒数（間に合わなくてもジャーナルに残る）
+SHUTDOWN_FLUSH_SEC = 30
+
+
+# ==================== ログの読み込み ====================
+
+def load_log_rows(xlsx_path):
+    # 正規化済みの全行 [(ISO日付, 開始, 終了, タスク, 分, メモ), ...]。
+    # SQLiteがあればそこから（+ SQLiteへの書き込みに失敗して残っているジャーナル分）、
+    # なければExcel + まだ取り込まれていないジャーナル分。
+    db_path = db_path_for(xlsx_path)
+    if os.path.exists(db_path):
+        db = WorkLogDB(db_path)
+        try:
+            rows = [tuple(row) for row in db.iter_normalized()]
+            unsynced = unsynced_rows(db.conn, xlsx_path)
+        finally:
+            db.close()
+        return rows + normalize_rows(unsynced) if unsynced else rows
+
+    seq, rows = load_rows(xlsx_path) if os.path.exists(xlsx_path) else (0, [])
+    pending = [row for s, row in WorkLogJournal(xlsx_path).read_entries() if s > seq]
+    return rows + normalize_rows(pending) if pending else rows
+
+
+# ==================== トラッカー ====================
+
+class TrackerCore:
+
+    def __init__(self, settings_path, output_dir, events_path=None, idle_compact_sec=COMPACT_IDLE_SEC):
+        self.settings_path = settings_path
+        self.output_dir = output_dir
+        self.idle_compact_sec = idle_compact_sec
+        # 操作を記録するファイル（replay 用）。None なら記録しない
+        self.events_path = events_path
+
+        self.groups = {}
+        self.saved_settings_text = None
+        self.current_task = STOPPED
+        self.current_memo = ""
+        self.start_time = None
+        self.writer = None
+
+    # ---------- 設定 ----------
+
+    def load_settings(self):
+        os.makedirs(os.path.dirname(self.settings_path), exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        if os.path.exists(self.settings_path):
+            with open(self.settings_path, 'r', encoding='utf_8') as f:
+                self.saved_settings_text = f.read()
+                settings = json.loads(self.saved_settings_text)
+            self.groups = settings["groups"] if "groups" in settings else settings
+            return True
+        self.groups = {g: list(tasks) for g, tasks in DEFAULT_GROUPS.items()}
+        return False
+
+    def write_settings(self):
+        # 内容が変わっていなければ書かない。PermissionError は呼び出し側で再試行する
+        settings = {
+            "groups": self.groups,
+            "output_dir": self.output_dir
+        }
+        text = json.dumps(settings, ensure_ascii=False, indent=4)
+        if text == self.saved_settings_text:
+            return False
+        # 一時ファイルに書き切ってから置き換える（途中で落ちても壊れたJSONを残さない）
+        tmp = self.settings_path + ".tmp"
+        with open(tmp, 'w', encoding='utf_8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.settings_path)
+        self.saved_settings_text = text
+        return True
+
+    # ---------- グループ・タスクの編集（変更があれば True） ----------
+
+    def move_group(self, group, step):
+        gl = list(self.groups.keys()); idx = gl.index(group); new = idx + step
+        if not 0 <= new < len(gl):
+            return False
+        gl[idx], gl[new] = gl[new], gl[idx]
+        self.groups = {g: self.groups[g] for g in gl}
+        return True
+
+    def move_task(self, group, task, step):
+        tasks = self.groups[group]; idx = tasks.index(task); new = idx + step
+        if not 0 <= new < len(tasks):
+            return False
+        tasks[idx], tasks[new] = tasks[new], tasks[idx]
+        return True
+
+    def add_group(self, name):
+        if not name or name in self.groups:
+            return False
+        self.groups[name] = []
+        return True
+
+    def rename_group(self, old, new):
+        if not new or new == old or new in self.groups:
+            return False
+        self.groups = {(new if k == old else k): v for k, v in self.groups.items()}
+        return True
+
+    def delete_group(self, group):
+        return self.groups.pop(group, None) is not None
+
+    def add_task(self, group, name):
+        if not name or name in self.groups[group]:
+            return False
+        self.groups[group].append(name)
+        return True
+
+    def rename_task(self, group, old, new):
+        tasks = self.groups[group]
+        if not new or new == old or new in tasks:
+            return False
+        tasks[tasks.index(old)] = new
+        return True
+
+    def delete_task(self, group, task):
+        if task not in self.groups[group]:
+            return False
+        self.groups[group].remove(task)
+        return True
+
+    # ---------- 記録 ----------
+
+    def get_log_file_path(self):
+        return os.path.join(self.output_dir, DEFAULT_LOG_FILE)
+
+    def set_output_dir(self, output_dir):
+        self.output_dir = output_dir
+        self.get_writer()
+
+    def get_writer(self):
+        path = self.get_log_file_path()
+        if self.writer is None or self.writer.journal.xlsx_path != path:
+            if self.writer is not None:
+                # 保存先の変更など。前の書き込みスレッドは取り込みを済ませて自分で終わるので待たない（UIを止めない）
+                self.writer.request_stop()
+            # work_log.db がある場合のみSQLiteにも書き込む（worklog_db.py import で作成。起動後に作られても拾う）
+            db_path = db_path_for(path)
+            db_factory = lambda: WorkLogDB(db_path) if os.path.exists(db_path) else None
+            self.writer = PersistenceWorker(WorkLogJournal(path), idle_compact_sec=self.idle_compact_sec,
+                                            db_factory=db_factory, rollup=WorkLogRollup(path))
+            self.writer.start()
+        return self.writer
+
+    def _record(self, op, now, **fields):
+        if self.events_path is None:
+            return
+        event = {"t": now.isoformat(timespec="seconds"), "op": op}
+        event.update(fields)
+        with open(self.events_path, "a", encoding="utf_8") as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def is_running(self):
+        return self.current_task != STOPPED
+
+    def switch(self, task, now=None):
+        # 実行中のタスクを記録して次のタスクを開始する（停止中からなら開始のみ）
+        now = now or datetime.now()
+        self._record("switch", now, task=task)
+        if self.is_running():
+            self.save_log(self.current_task, self.start_time, now, self.current_memo)
+        self.current_task = task; self.current_memo = ""; self.start_time = now
+
+    start = switch
+
+    def set_memo(self, text, now=None):
+        if not self.is_running():
+            return False
+        self._record("memo", now or datetime.now(), text=text)
+        self.current_memo = text
+        return True
+
+    def complete(self, now=None):
+        # 実行中のタスクを記録して停止し、Excelへの取り込みを依頼する
+        if not self.is_running():
+            return False
+        now = now or datetime.now()
+        self._record("complete", now)
+        self.save_log(self.current_task, self.start_time, now, self.current_memo)
+        self.current_task = STOPPED; self.current_memo = ""; self.start_time = None
+        self.get_writer().request_compact()
+        return True
+
+    def save_log(self, task, start, end, memo=""):
+        # キューに積むだけ。ジャーナル追記とExcelへの取り込みは書き込みスレッドが行う
+        self.get_writer().submit(make_row(task, start, end, memo))
+
+    def flush(self, timeout=SHUTDOWN_FLUSH_SEC):
+        return self.get_writer().flush(timeout)
+
+    def close(self, timeout=SHUTDOWN_FLUSH_SEC):
+        if self.writer is not None:
+            self.writer.stop(timeout)
+            self.writer = None
+
+    # ---------- 集計 ----------
+
+    def open_summary(self):
+        # latest_date() / task_totals(start, end) / close() を持つ集計ビュー。
+        # SQLiteがあればインデックス付きSQL、なければ日付×タスクの集計キャッシュ
+        path = self.get_log_file_path()
+        db_path = db_path_for(path)
+        if os.path.exists(db_path):
+            return WorkLogDB(db_path, xlsx_path=path)
+        return RollupView(WorkLogRollup(path).load_days())
+
+    def task_totals(self, start=None, end=None):
+        summary = self.open_summary()
+        try:
+            return summary.task_totals(start, end)
+        finally:
+            summary.close()
+
+
+# ==================== リプレイ ====================
+
+def read_events(path):
+    with open(path, "r", encoding="utf_8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def events_from_log(xlsx_path):
+    # 既存ログの各行を「開始時刻に切り替え」、各日の最後を「完了」として操作列を組み立てる
+    events = []
+    last_day = None
+    for iso, start, end, task, _, memo in load_log_rows(xlsx_path):
+        if not start or not end:
+            continue
+        if last_day is not None and iso != last_day[0]:
+            events.append({"t": last_day[1], "op": "complete"})
+        events.append({"t": f"{iso}T{start}:00", "op": "switch", "task": task})
+        if memo:
+            events.append({"t": f"{iso}T{start}:00", "op": "memo", "text": memo})
+        last_day = (iso, f"{iso}T{end}:00")
+    if last_day is not None:
+        events.append({"t": last_day[1], "op": "complete"})
+    return events
+
+
+def replay(events, output_dir, settings_path=None):
+    # 操作列を実時間を待たずに流し、操作ごとの所要時間と最終的な書き込み時間を測る
+    settings_path = settings_path or os.path.join(output_dir, "tracker_settings.json")
+    core = TrackerCore(settings_path, output_dir)
+    core.load_settings()
+    latencies = []
+    began = time.perf_counter()
+    for event in events:
+        now = datetime.fromisoformat(event["t"])
+        t0 = time.perf_counter()
+        if event["op"] == "switch":
+            core.switch(event["task"], now)
+        elif event["op"] == "memo":
+            core.set_memo(event.get("text", ""), now)
+        elif event["op"] == "complete":
+            core.complete(now)
+        latencies.append(time.perf_counter() - t0)
+    dispatched = time.perf_counter() - began
+    core.close(timeout=None)
+    total = time.perf_counter() - began
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        "events": len(events),
+        "dispatch_sec": dispatched,
+        "total_sec": total,
+        "events_per_sec": len(events) / total if total else 0.0,
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "rows": len(load_log_rows(core.get_log_file_path())),
+    }
+
+
+# ==================== メイン ====================
+
+def main(argv):
+    if not argv or argv[0] != "replay" or len(argv) < 2:
+        print("使い方: python tracker_core.py replay <events.jsonl> [出力フォルダ]")
+        print("        python tracker_core.py replay --from-log <work_log.xlsx> [出力フォルダ]")
+        return 1
+    args = argv[1:]
+    if args[0] == "--from-log":
+        events = events_from_log(args[1])
+        args = args[2:]
+    else:
+        events = read_events(args[0])
+        args = args[1:]
+    output_dir = args[0] if args else tempfile.mkdtemp(prefix="tracker_replay_")
+
+    stats = replay(events, output_dir)
+    print(f"📂 出力先: {output_dir}")
+    print(f"⏱ {stats['events']}操作 / {stats['total_sec']:.2f}秒（{stats['events_per_sec']:.0f}操作/秒、"
+          f"うち呼び出し {stats['dispatch_sec']:.3f}秒）")
+    print(f"   1操作あたり p50 {stats['p50_ms']:.3f}ms / p99 {stats['p99_ms']:.3f}ms / 最大 {stats['max_ms']:.3f}ms")
+    print(f"📝 記録行数: {stats['rows']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,158 @@
+# window_batch.py
+# 作業ウィンドウチェック式のフォルダ全体をまとめて処理する：ファイルごとにセッション化 → タスク別に集計し、
+# 全ファイル分をタスク・グループ列付きのセッション表（window_sessions.csv）に書き出す（dashboard.py が読む）。
+# 結果はファイル内容のハッシュをキーに window_cache.json に残し、2回目以降は新しいファイル・変わったファイルだけ
+# プロセスプールで読み直す（終わった日のログは変わらない）。
+
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from window_rules import TitleClassifier
+from window_sessions import SESSION_COLUMNS, SESSIONS_FILE, read_sessions, sample_files, session_row, write_table
+
+# ==================== 設定 ====================
+
+CACHE_FILE = "window_cache.json"
+CACHE_VERSION = 1
+BATCH_COLUMNS = SESSION_COLUMNS + ["タスク", "グループ"]
+# 読み直すファイルがこれ未満ならプロセスを起こさずその場で読む（起動コストの方が大きい）
+MIN_PARALLEL_FILES = 4
+
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def json_digest(value):
+    # ルール・グループ分けの変更検出用
+    text = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(text.encode("utf_8"), digest_size=16).hexdigest()
+
+
+def file_sessions(path):
+    # プロセスプールで呼ぶ：1ファイル分のセッション行
+    return [session_row(session) for session in read_sessions(path)]
+
+
+# ==================== キャッシュ ====================
+
+def load_cache(path):
+    try:
+        with open(path, "r", encoding="utf_8") as f:
+            data = json.load(f)
+        if data.get("version") == CACHE_VERSION:
+            return data
+    except (OSError, ValueError):
+        pass
+    return {"version": CACHE_VERSION, "files": {}, "results": {}}
+
+
+def save_cache(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf_8") as f:
+        # json.dump は1要素ずつ Python で書き出すので、dumps（C実装）で1回に文字列にする
+        f.write(json.dumps(data, ensure_ascii=False))
+    os.replace(tmp, path)
+
+
+# ==================== 一括処理 ====================
+
+def process_folder(directory, classifier=None, max_workers=None):
+    # (タスク・グループ列付きの全セッション行, 統計)。window_cache.json と window_sessions.csv を更新する
+    began = time.perf_counter()
+    classifier = classifier or TitleClassifier.from_files()
+    # ルールが変わったらタスク別集計だけやり直す（セッションは読み直さない）。
+    # グループ分け（tracker_settings.json）が変わったらセッション表の グループ 列だけ書き直す
+    rules_key = json_digest(classifier.rules)
+    groups_key = json_digest(classifier.task_groups)
+    cache_path = os.path.join(directory, CACHE_FILE)
+    cache = load_cache(cache_path)
+    paths = sample_files(directory)
+
+    # サイズ・更新時刻が前回と同じならハッシュも同じとみなす（読まずに済む）
+    files, digests, misses = {}, {}, {}
+    for path in paths:
+        name = os.path.basename(path)
+        st = os.stat(path)
+        stat = [st.st_size, st.st_mtime_ns]
+        known = cache["files"].get(name)
+        digest = known["hash"] if known and known["stat"] == stat else file_digest(path)
+        files[name] = {"stat": stat, "hash": digest}
+        digests[path] = digest
+        if digest not in cache["results"]:
+            misses.setdefault(digest, path)
+
+    changed = list(misses.values())
+    workers = min(len(changed), max_workers or os.cpu_count() or 1)
+    if len(changed) >= MIN_PARALLEL_FILES and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(file_sessions, changed, chunksize=max(1, len(changed) // (workers * 4))))
+    else:
+        parsed = [file_sessions(path) for path in changed]
+    results = {digest: cache["results"].get(digest) for digest in set(digests.values())}
+    for digest, rows in zip(misses, parsed):
+        results[digest] = {"sessions": rows}
+
+    dirty = (bool(changed) or files != cache["files"] or len(results) != len(cache["results"])
+             or cache.get("groups") != groups_key)
+    rows, totals, groups = [], {}, {}
+    for path in paths:
+        result = results[digests[path]]
+        if result.get("rules") != rules_key:
+            dirty = True
+            result["totals"] = {}
+            for row in result["sessions"]:
+                task = classifier.classify(row[4])
+                result["totals"][task] = result["totals"].get(task, 0.0) + row[3]
+            result["rules"] = rules_key
+        for task, minutes in result["totals"].items():
+            totals[task] = totals.get(task, 0.0) + minutes
+        for row in result["sessions"]:
+            task = classifier.classify(row[4])
+            if task not in groups:
+                groups[task] = classifier.group(task)
+            rows.append(row + [task, groups[task]])
+
+    # 何も変わっていなければ書き直さない。今あるファイルの分だけ残す（消えたファイル・古い内容の結果は捨てる）
+    out_path = os.path.join(directory, SESSIONS_FILE)
+    if dirty or not os.path.exists(out_path):
+        save_cache(cache_path, {"version": CACHE_VERSION, "files": files, "groups": groups_key, "results": results})
+        write_table(out_path, BATCH_COLUMNS, rows)
+
+    elapsed = time.perf_counter() - began
+    return rows, {
+        "files": len(paths),
+        "parsed": len(changed),
+        "hit_rate": (len(paths) - sum(1 for p in paths if digests[p] in misses)) / len(paths) if paths else 0.0,
+        "sessions": len(rows),
+        "totals": totals,
+        "elapsed_sec": elapsed,
+        "files_per_sec": len(paths) / elapsed if elapsed else 0.0,
+    }
+
+
+# ==================== メイン ====================
+
+def main(argv):
+    if len(argv) != 1 or not os.path.isdir(argv[0]):
+        print("使い方: python window_batch.py <作業ウィンドウチェック式フォルダ>")
+        return 1
+    _, stats = process_folder(argv[0])
+    if not stats["files"]:
+        print(f"❌ ログが見つかりません: {argv[0]}")
+        return 1
+    print(f"⏱ {stats['files']}ファイル / {stats['elapsed_sec']:.3f}秒（{stats['files_per_sec']:.0f}ファイル/秒）、"
+          f"キャッシュヒット率 {stats['hit_rate'] * 100:.0f}%（読み直し {stats['parsed']}ファイル）")
+    print(f"✅ {stats['sessions']}セッション: {os.path.join(argv[0], SESSIONS_FILE)}")
+    for task, minutes in sorted(stats["totals"].items(), key=lambda item: item[1], reverse=True):
+        print(f"   {minutes / 60:6.1f}h  {task}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,183 @@
+# window_reconcile.py
+# 工数ログ（work_log.xlsx の 開始〜終了・タスク）と作業ウィンドウチェック式のログ（1分ごとの画面）の突き合わせ。
+#   記録した区間ごと : その間に主に使っていたアプリと、画面を使っていなかった分（アイドル分 = ロック画面など）。
+#                      サンプル自体が無い分（PCの停止・チェックツール未起動）はアイドルと区別して 記録なし分 にする
+#   記録の抜け       : トラッカーが停止中なのに画面を使っていた時間帯
+# 区間を分単位の表に展開し、searchsorted で各サンプルが入る区間を二分探索する（二重ループにしない）。
+# どちらか一方のログしかない日は比べようがないので、両方ある日だけを対象にする。
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from window_sessions import GAP_MINUTES, IDLE_TITLES, sample_files
+from window_store import EPOCH, TitleHistory, from_minutes
+from worklog_frame import load_frame
+
+# ==================== 設定 ====================
+
+# 区間ごとに表示する主なアプリの数
+TOP_APPS = 3
+# アイドル分がこれ以上の区間を「記録したが画面を使っていない」として挙げる
+IDLE_ALERT_MINUTES = 10
+# 停止中に画面を使っていた時間がこれ以上の時間帯を「記録の抜け」として挙げる
+GAP_ALERT_MINUTES = 5
+MINUTES_PER_DAY = 24 * 60
+
+
+def app_name(title):
+    # 'ファイル名 - Google Chrome' → 'Google Chrome'（区切りが無ければタイトルそのもの）
+    return title.rsplit(" - ", 1)[-1].rstrip("●").strip() or title
+
+
+def log_intervals(df):
+    # 工数ログ → (開始の分, 終了の分) の配列（1970-01-01 00:00 からの分。日付をまたぐ区間は終了を翌日にする）
+    days = (pd.to_datetime(df["日付"]) - EPOCH).dt.days.to_numpy(dtype=np.int64) * MINUTES_PER_DAY
+
+    def clock(col):
+        # 'HH:MM' 以外（空・読めない値）は NaN。列に1つも ':' が無くても2列で返るよう extract を使う
+        parts = df[col].astype(str).str.extract(r"^\s*(\d{1,2}):(\d{2})")
+        return (pd.to_numeric(parts[0], errors="coerce") * 60 + pd.to_numeric(parts[1], errors="coerce")).to_numpy()
+
+    start = days + clock("開始")
+    end = days + clock("終了")
+    end = np.where(end < start, end + MINUTES_PER_DAY, end)
+    return start, end
+
+
+def top_apps(minutes_by_app):
+    # 'Google Chrome 34分 / Excel 10分'
+    return " / ".join(f"{app} {minutes:.0f}分" for app, minutes in minutes_by_app[:TOP_APPS])
+
+
+# ==================== 突き合わせ ====================
+
+def reconcile(history, log_df, gap_minutes=GAP_MINUTES):
+    # (区間ごとの表, 記録の抜けの表)
+    if not len(history) or log_df.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # タイトル番号 → アプリ番号・アイドルか（タイトルの種類数の分だけ判定する）
+    apps, app_codes = [], {}
+    title_app = np.empty(len(history.titles), dtype=np.int32)
+    title_idle = np.zeros(len(history.titles), dtype=bool)
+    for title_id, title in enumerate(history.titles):
+        app = app_name(title)
+        if app not in app_codes:
+            app_codes[app] = len(apps)
+            apps.append(app)
+        title_app[title_id] = app_codes[app]
+        title_idle[title_id] = title in IDLE_TITLES
+
+    order = np.argsort(history.minutes, kind="stable")
+    minutes = np.asarray(history.minutes)[order].astype(np.int64)
+    # ログが重なっていて同じ分のサンプルが複数あるときは最初の1つだけ（1分 = 1サンプルで数える）
+    first = np.concatenate(([True], np.diff(minutes) != 0))
+    order, minutes = order[first], minutes[first]
+    sample_app = title_app[np.asarray(history.title_ids)[order]]
+    sample_idle = title_idle[np.asarray(history.title_ids)[order]]
+
+    # 両方のログがある日だけ
+    log_start, log_end = log_intervals(log_df)
+    valid = ~(np.isnan(log_start) | np.isnan(log_end))
+    log_days = np.unique(log_start[valid] // MINUTES_PER_DAY)
+    sample_days = minutes // MINUTES_PER_DAY
+    shared_days = np.intersect1d(log_days, np.unique(sample_days))
+    keep = np.isin(sample_days, shared_days)
+    minutes, sample_app, sample_idle = minutes[keep], sample_app[keep], sample_idle[keep]
+    rows = np.flatnonzero(valid & np.isin(log_start // MINUTES_PER_DAY, shared_days) & (log_end > log_start))
+    if not len(rows) or not len(minutes):
+        return pd.DataFrame(), pd.DataFrame()
+
+    # 区間を開始順に並べ、各区間を含む分に展開して「分 → 区間」の表を作り、各サンプルの分を二分探索で引く（-1 は停止中）。
+    # 区間が重なっているときは開始の遅い方に入れる。表の大きさは区間の長さの合計なので、重なり方によらずほぼ線形
+    rows = rows[np.argsort(log_start[rows], kind="stable")]
+    starts = log_start[rows].astype(np.int64)
+    ends = log_end[rows].astype(np.int64)
+    lengths = ends - starts
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    covered = np.repeat(starts, lengths) + offsets
+    owner = np.repeat(np.arange(len(rows)), lengths)
+    # 同じ分を含む区間のうち番号の大きい方（開始の遅い方）を残す
+    order = np.lexsort((owner, covered))
+    covered, owner = covered[order], owner[order]
+    last = np.concatenate((covered[1:] != covered[:-1], [True]))
+    covered, owner = covered[last], owner[last]
+    pos = np.minimum(np.searchsorted(covered, minutes), len(covered) - 1)
+    inside = covered[pos] == minutes
+    slot = np.where(inside, owner[pos], -1)
+
+    # 区間ごと：画面を使っていた分・アイドル分・主なアプリ
+    active = inside & ~sample_idle
+    used = np.bincount(slot[active], minlength=len(rows))
+    idle = np.bincount(slot[inside & sample_idle], minlength=len(rows))
+    counts = pd.DataFrame({"slot": slot[active], "app": sample_app[active]}).value_counts()
+    per_slot = {}
+    for (s, app), n in counts.items():
+        per_slot.setdefault(s, []).append((apps[app], n))
+    logged = ends - starts
+    intervals = log_df.iloc[rows][["日付", "開始", "終了", "タスク"]].reset_index(drop=True)
+    intervals["記録分"] = logged
+    intervals["使用分"] = used
+    intervals["アイドル分"] = idle
+    intervals["記録なし分"] = logged - used - idle
+    intervals["主なアプリ"] = [top_apps(per_slot.get(s, [])) for s in range(len(rows))]
+
+    # 停止中に画面を使っていたサンプルを、gap_minutes 以内の間隔でつながる時間帯にまとめる
+    stray = ~inside & ~sample_idle
+    stray_minutes, stray_apps = minutes[stray], sample_app[stray]
+    gaps = []
+    if len(stray_minutes):
+        breaks = np.flatnonzero(np.diff(stray_minutes) > gap_minutes) + 1
+        for first, last in zip(np.concatenate(([0], breaks)), np.concatenate((breaks, [len(stray_minutes)]))):
+            span = stray_apps[first:last]
+            by_app = sorted(((apps[a], n) for a, n in zip(*np.unique(span, return_counts=True))),
+                            key=lambda item: item[1], reverse=True)
+            begin = from_minutes(stray_minutes[first])
+            finish = from_minutes(stray_minutes[last - 1] + 1)
+            gaps.append([begin.date(), begin.strftime("%H:%M"), finish.strftime("%H:%M"), last - first, top_apps(by_app)])
+    gaps = pd.DataFrame(gaps, columns=["日付", "開始", "終了", "使用分", "主なアプリ"])
+    return intervals, gaps
+
+
+# ==================== メイン ====================
+
+def main(argv):
+    if len(argv) != 2 or not os.path.isdir(argv[0]):
+        print("使い方: python window_reconcile.py <作業ウィンドウチェック式フォルダ> <work_log.xlsx>")
+        return 1
+    paths = sample_files(argv[0])
+    if not paths or not os.path.exists(argv[1]):
+        print("❌ ログが見つかりません")
+        return 1
+
+    history = TitleHistory.from_files(paths)
+    log_df = load_frame(argv[1])
+    began = time.perf_counter()
+    intervals, gaps = reconcile(history, log_df)
+    elapsed = time.perf_counter() - began
+    if intervals.empty:
+        print("❌ 両方のログがある日がありません")
+        return 1
+
+    print(f"⏱ {len(history)}サンプル × {len(log_df)}区間: {elapsed * 1000:.1f}ms")
+    print(f"📊 突き合わせた区間 {len(intervals)}件（{intervals['日付'].nunique()}日分）")
+    idle = intervals[intervals["アイドル分"] >= IDLE_ALERT_MINUTES]
+    if len(idle):
+        print(f"💤 記録しているが画面を使っていない区間（{IDLE_ALERT_MINUTES}分以上）")
+        for r in idle.itertuples(index=False):
+            print(f"   {r.日付} {r.開始}-{r.終了} {r.タスク}: アイドル {r.アイドル分}分 / {r.記録分}分"
+                  f"（記録なし {r.記録なし分}分）  {r.主なアプリ}")
+    stray = gaps[gaps["使用分"] >= GAP_ALERT_MINUTES] if len(gaps) else gaps
+    if len(stray):
+        print(f"❓ 停止中に画面を使っていた時間帯（{GAP_ALERT_MINUTES}分以上）")
+        for r in stray.itertuples(index=False):
+            print(f"   {r.日付} {r.開始}-{r.終了}: {r.使用分}分  {r.主なアプリ}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
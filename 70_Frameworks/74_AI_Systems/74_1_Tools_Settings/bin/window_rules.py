@@ -0,0 +1,154 @@
+# window_rules.py
+# ウィンドウタイトル → トラッカーのタスク（とグループ）の振り分け（configs/window_rules.json）。
+# ルールはタスクごとに contains（部分一致）・regex（正規表現）・app（' - アプリ名' で終わる）を並べて書く。
+# 全ルールを1本の正規表現にまとめて1回の match で判定し、結果はタイトルごとに覚えておく（同じタイトルが何百回も出る）。
+# 大文字・小文字は区別しない。複数のルールに当たるときはファイルで先に書いたルールが優先。
+
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+from task_groups import UNGROUPED_LABEL, load_task_groups
+from window_sessions import SAMPLE_PATTERN, read_sessions, sample_files
+
+# ==================== 設定 ====================
+
+CONFIG_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "configs"))
+RULES_FILE = os.path.join(CONFIG_DIR, "window_rules.json")
+SETTINGS_FILE = os.path.join(CONFIG_DIR, "tracker_settings.json")
+# どのルールにも当たらなかったタイトルのタスク
+UNMATCHED_TASK = "未分類"
+# 未分類タイトルの一覧に出す件数
+UNMATCHED_TOP = 20
+
+
+def load_rules(path=RULES_FILE):
+    # [{"task": ..., "contains": [...], "regex": [...], "app": [...]}, ...]（無ければ空）
+    try:
+        with open(path, "r", encoding="utf_8") as f:
+            return json.load(f).get("rules", [])
+    except (OSError, ValueError):
+        return []
+
+
+# ==================== 振り分け ====================
+
+def rule_pattern(rule):
+    # 1ルール分の選択肢（タイトルのどこかに当たるかを先読みで調べる）
+    parts = [f"(?=.*?{re.escape(text)})" for text in rule.get("contains", [])]
+    for expr in rule.get("regex", []):
+        try:
+            re.compile(expr)
+        except re.error as e:
+            raise ValueError(f"{rule.get('task')} の正規表現が不正です: {expr}（{e}）") from None
+        parts.append(f"(?=.*?(?:{expr}))")
+    # 'ファイル名 - Excel' のような末尾のアプリ名（タイトルがアプリ名だけの場合も）
+    parts += [f"(?=(?:.*? - )?{re.escape(app)}\\s*$)" for app in rule.get("app", [])]
+    return "|".join(parts)
+
+
+def compile_rules(rules):
+    # (まとめた正規表現, 各ルールのタスク)。当たったルールは末尾の空の名前付きグループ r<番号> で分かる
+    alternatives, tasks = [], []
+    for rule in rules:
+        pattern = rule_pattern(rule)
+        if not pattern:
+            continue
+        alternatives.append(f"(?:{pattern})(?P<r{len(tasks)}>)")
+        tasks.append(rule["task"])
+    if not alternatives:
+        return None, tasks
+    return re.compile("^(?:" + "|".join(alternatives) + ")", re.IGNORECASE | re.DOTALL), tasks
+
+
+class TitleClassifier:
+
+    def __init__(self, rules, task_groups=None):
+        self.rules = rules
+        self.pattern, self.tasks = compile_rules(rules)
+        self.task_groups = task_groups or {}
+        # タイトル → タスク
+        self.cache = {}
+
+    @classmethod
+    def from_files(cls, rules_path=RULES_FILE, settings_path=SETTINGS_FILE):
+        return cls(load_rules(rules_path), load_task_groups(settings_path))
+
+    def classify(self, title):
+        task = self.cache.get(title)
+        if task is None:
+            m = self.pattern.match(title) if self.pattern else None
+            task = self.tasks[int(m.lastgroup[1:])] if m else UNMATCHED_TASK
+            self.cache[title] = task
+        return task
+
+    def group(self, task):
+        return self.task_groups.get(task, UNGROUPED_LABEL)
+
+    def classify_frame(self, df, column="ウィンドウタイトル"):
+        # セッション表（window_sessions.load_sessions_frame）に タスク・グループ 列を付ける
+        titles = df[column].unique()
+        tasks = {title: self.classify(title) for title in titles}
+        df = df.assign(タスク=df[column].map(tasks))
+        return df.assign(グループ=df["タスク"].map({t: self.group(t) for t in set(tasks.values())}))
+
+
+def summarize(sessions, classifier):
+    # ({タスク: 分}, {未分類のタイトル: 分})
+    totals, unmatched = defaultdict(float), defaultdict(float)
+    for session in sessions:
+        minutes = (session.end - session.start).total_seconds() / 60
+        task = classifier.classify(session.title)
+        totals[task] += minutes
+        if task == UNMATCHED_TASK:
+            unmatched[session.title] += minutes
+    return dict(totals), dict(unmatched)
+
+
+def ranked(minutes_by_key):
+    # 分の多い順の [(キー, 分), ...]
+    return sorted(minutes_by_key.items(), key=lambda item: item[1], reverse=True)
+
+
+# ==================== メイン ====================
+
+def main(argv):
+    if len(argv) not in (1, 2):
+        print("使い方: python window_rules.py <作業ウィンドウチェック式フォルダ | ログCSV> [window_rules.json]")
+        return 1
+    source = argv[0]
+    paths = sample_files(source) if os.path.isdir(source) else [source]
+    if not paths:
+        print(f"❌ ログ（{SAMPLE_PATTERN}）が見つかりません: {source}")
+        return 1
+    try:
+        classifier = TitleClassifier.from_files(argv[1] if len(argv) > 1 else RULES_FILE)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    began = time.perf_counter()
+    sessions = [s for path in paths for s in read_sessions(path)]
+    loaded = time.perf_counter()
+    totals, unmatched = summarize(sessions, classifier)
+    classified = time.perf_counter() - loaded
+
+    samples = sum(s.samples for s in sessions)
+    print(f"⏱ {len(paths)}ファイル / {samples}サンプル / {len(sessions)}セッション / タイトル{len(classifier.cache)}種類: "
+          f"読み込み {loaded - began:.3f}秒、振り分け {classified * 1000:.1f}ms")
+    print("📊 タスク別")
+    for task, minutes in ranked(totals):
+        label = task if task == UNMATCHED_TASK else f"{task}（{classifier.group(task)}）"
+        print(f"   {minutes / 60:6.1f}h  {label}")
+    if unmatched:
+        print(f"❓ 未分類のタイトル（時間の多い順 上位{UNMATCHED_TOP}件）")
+        for title, minutes in ranked(unmatched)[:UNMATCHED_TOP]:
+            print(f"   {minutes:6.0f}分  {title or '（空）'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
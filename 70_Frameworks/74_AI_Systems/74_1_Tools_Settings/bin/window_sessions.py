@@ -0,0 +1,144 @@
+# window_sessions.py
+# 作業ウィンドウチェック式のログ（1分ごとの 日時,ウィンドウタイトル。cp932 の CSV）をセッションにまとめる。
+# 同じタイトルが続いている間を1セッション（開始・終了・分）とし、ファイルは1行ずつ読むのでメモリは行数によらず一定。
+# 出力はセッション表の CSV（dashboard.py から pandas でそのまま読める）。
+
+import csv
+import glob
+import os
+import sys
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# ==================== 設定 ====================
+
+ENCODING = "cp932"
+SAMPLE_PATTERN = "工数ログ_*開始.csv"
+# 1サンプルが表す時間（分）
+SAMPLE_MINUTES = 1
+# サンプルの間隔がこれを超えたら（PCの停止・スリープなど）同じタイトルでもセッションを分ける
+GAP_MINUTES = 2
+# タイトルが空のサンプル（ロック画面・デスクトップなど）
+IDLE_TITLE = ""
+# 席を外している（画面を使っていない）とみなすタイトル
+IDLE_TITLES = {IDLE_TITLE, "IDLE/Locked", "Windows の既定のロック画面"}
+SESSION_COLUMNS = ["日付", "開始", "終了", "分", "ウィンドウタイトル"]
+SESSIONS_FILE = "window_sessions.csv"
+
+Session = namedtuple("Session", ["start", "end", "title", "samples"])
+
+
+def sample_files(directory):
+    # 作業ウィンドウチェック式のフォルダ内のログ（ファイル名 = 開始日時なので名前順 = 時系列順）
+    return sorted(glob.glob(os.path.join(directory, SAMPLE_PATTERN)))
+
+
+# ==================== 読み込み ====================
+
+def parse_timestamp(text):
+    # '2025/12/24 9:17' と '2026-01-13 09:13' の両方。strptime より速いので自前で分解する
+    day, _, clock = text.strip().partition(" ")
+    y, m, d = day.replace("-", "/").split("/")
+    hh, mm = clock.split(":")[:2]
+    return datetime(int(y), int(m), int(d), int(hh), int(mm))
+
+
+def iter_samples(path):
+    # (datetime, タイトル) を1行ずつ返す。日時が空・読めない行（末尾の ',' だけの行など）は飛ばす
+    with open(path, "r", encoding=ENCODING, errors="replace", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if not row or not row[0].strip():
+                continue
+            try:
+                at = parse_timestamp(row[0])
+            except ValueError:
+                continue
+            yield at, (row[1].strip() if len(row) > 1 else IDLE_TITLE)
+
+
+# ==================== セッション化 ====================
+
+def sessionize(samples, gap_minutes=GAP_MINUTES):
+    # 連続する同じタイトルのサンプルを1つの Session にまとめる（ランレングス圧縮）。
+    # 終了は最後のサンプル + SAMPLE_MINUTES（そのサンプルの1分間も含める）
+    step = timedelta(minutes=SAMPLE_MINUTES)
+    gap = timedelta(minutes=gap_minutes)
+    start = last = title = None
+    count = 0
+    for at, sample_title in samples:
+        if count and (sample_title != title or at - last > gap or at < last):
+            yield Session(start, last + step, title, count)
+            count = 0
+        if not count:
+            start, title = at, sample_title
+        last = at
+        count += 1
+    if count:
+        yield Session(start, last + step, title, count)
+
+
+def read_sessions(path, gap_minutes=GAP_MINUTES):
+    return sessionize(iter_samples(path), gap_minutes)
+
+
+def session_row(session):
+    minutes = (session.end - session.start).total_seconds() / 60
+    return [session.start.strftime("%Y/%m/%d"), session.start.strftime("%H:%M"),
+            session.end.strftime("%H:%M"), minutes, session.title]
+
+
+def write_table(out_path, columns, rows):
+    # セッション表の CSV（UTF-8 BOM付き。Excelでも開ける）を一時ファイル経由で書く。書いた行数を返す
+    tmp = out_path + ".tmp"
+    count = 0
+    with open(tmp, "w", encoding="utf_8_sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    os.replace(tmp, out_path)
+    return count
+
+
+def write_sessions(paths, out_path, gap_minutes=GAP_MINUTES):
+    # 全ファイルのセッションを1つの CSV に書く。書いたセッション数を返す
+    rows = (session_row(session) for path in paths for session in read_sessions(path, gap_minutes))
+    return write_table(out_path, SESSION_COLUMNS, rows)
+
+
+def load_sessions_frame(path):
+    # dashboard.py 用：セッション表の CSV → DataFrame（日付は date）
+    import pandas as pd
+
+    df = pd.read_csv(path, encoding="utf_8_sig", dtype={"開始": str, "終了": str, "ウィンドウタイトル": str},
+                     keep_default_na=False)
+    df["日付"] = pd.to_datetime(df["日付"], format="%Y/%m/%d").dt.date
+    return df
+
+
+# ==================== メイン ====================
+
+def main(argv):
+    if len(argv) not in (1, 2):
+        print("使い方: python window_sessions.py <作業ウィンドウチェック式フォルダ | ログCSV> [出力CSV]")
+        return 1
+    source = argv[0]
+    if os.path.isdir(source):
+        paths = sample_files(source)
+        out_path = argv[1] if len(argv) > 1 else os.path.join(source, SESSIONS_FILE)
+    else:
+        paths = [source]
+        out_path = argv[1] if len(argv) > 1 else os.path.splitext(source)[0] + ".sessions.csv"
+    if not paths:
+        print(f"❌ ログが見つかりません: {source}")
+        return 1
+    n = write_sessions(paths, out_path)
+    print(f"✅ {len(paths)}ファイル → {n}セッション: {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
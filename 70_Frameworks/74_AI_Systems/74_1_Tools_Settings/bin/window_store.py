@@ -0,0 +1,167 @@
+# window_store.py
+# 作業ウィンドウチェック式のログ（何か月分ものサンプル）をコンパクトに持つ形式。
+# タイトルは重複が多いので、異なるタイトルだけの文字列表（titles.json）と、サンプルごとの
+#   minutes.npy   : 日時（1970-01-01 00:00 からの分。int32）
+#   title_ids.npy : タイトル番号（文字列表の添字。int32）
+# の2列に分けて保存する。.npy は np.load(mmap_mode="r") でコピーせずにそのまま使える。
+# セッション化・タスクの振り分けもタイトル番号の配列のまま numpy で行う（タイトルの判定は種類数の分だけ）。
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from array import array
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from window_sessions import GAP_MINUTES, SAMPLE_MINUTES, iter_samples, sample_files
+
+# ==================== 設定 ====================
+
+HISTORY_DIR = "window_history"
+TITLES_FILE = "titles.json"
+MINUTES_FILE = "minutes.npy"
+IDS_FILE = "title_ids.npy"
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_minutes(at):
+    return int((at - EPOCH).total_seconds()) // 60
+
+
+def from_minutes(minutes):
+    return EPOCH + timedelta(minutes=int(minutes))
+
+
+# ==================== 履歴 ====================
+
+class TitleHistory:
+
+    def __init__(self, minutes, title_ids, titles):
+        self.minutes = minutes
+        self.title_ids = title_ids
+        self.titles = titles
+
+    def __len__(self):
+        return len(self.minutes)
+
+    @classmethod
+    def from_files(cls, paths):
+        # ログを1行ずつ読みながら符号化する（文字列はタイトルの種類数の分だけ持つ）
+        minutes, title_ids = array("i"), array("i")
+        index, titles = {}, []
+        for path in paths:
+            for at, title in iter_samples(path):
+                title_id = index.get(title)
+                if title_id is None:
+                    title_id = index[title] = len(titles)
+                    titles.append(title)
+                minutes.append(to_minutes(at))
+                title_ids.append(title_id)
+        return cls(np.frombuffer(minutes, dtype=np.int32), np.frombuffer(title_ids, dtype=np.int32), titles)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, values in ((MINUTES_FILE, self.minutes), (IDS_FILE, self.title_ids)):
+            tmp = os.path.join(directory, name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(values, dtype=np.int32))
+            os.replace(tmp, os.path.join(directory, name))
+        tmp = os.path.join(directory, TITLES_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf_8") as f:
+            f.write(json.dumps(self.titles, ensure_ascii=False))
+        os.replace(tmp, os.path.join(directory, TITLES_FILE))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        # mmap=True なら配列はファイルを直接参照する（読み込み時にコピーしない）
+        mode = "r" if mmap else None
+        minutes = np.load(os.path.join(directory, MINUTES_FILE), mmap_mode=mode)
+        title_ids = np.load(os.path.join(directory, IDS_FILE), mmap_mode=mode)
+        with open(os.path.join(directory, TITLES_FILE), "r", encoding="utf_8") as f:
+            titles = json.load(f)
+        return cls(minutes, title_ids, titles)
+
+    def nbytes(self):
+        # 配列 + 文字列表（UTF-8）のバイト数
+        return self.minutes.nbytes + self.title_ids.nbytes + sum(len(t.encode("utf_8")) for t in self.titles)
+
+    # ---------- セッション化・振り分け ----------
+
+    def sessions(self, gap_minutes=GAP_MINUTES):
+        # window_sessions.sessionize と同じ区切りを配列で求める。
+        # (開始の分, 終了の分, タイトル番号, サンプル数) の4つの配列
+        if not len(self):
+            empty = np.empty(0, dtype=np.int32)
+            return empty, empty, empty, empty
+        step = np.diff(self.minutes)
+        breaks = (np.diff(self.title_ids) != 0) | (step > gap_minutes) | (step < 0)
+        first = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+        last = np.concatenate((first[1:] - 1, [len(self) - 1]))
+        return (self.minutes[first], self.minutes[last] + SAMPLE_MINUTES,
+                self.title_ids[first], (last - first + 1).astype(np.int32))
+
+    def task_codes(self, classifier):
+        # (タスク名のリスト, タイトル番号 → タスク番号 の配列)。判定はタイトルの種類ごとに1回だけ
+        tasks, codes = [], {}
+        lookup = np.empty(len(self.titles), dtype=np.int32)
+        for title_id, title in enumerate(self.titles):
+            task = classifier.classify(title)
+            if task not in codes:
+                codes[task] = len(tasks)
+                tasks.append(task)
+            lookup[title_id] = codes[task]
+        return tasks, lookup
+
+    def task_minutes(self, classifier, gap_minutes=GAP_MINUTES):
+        # {タスク: 分}（セッションの長さの合計。window_rules.summarize と同じ値）
+        start, end, title_ids, _ = self.sessions(gap_minutes)
+        tasks, lookup = self.task_codes(classifier)
+        totals = np.bincount(lookup[title_ids], weights=end - start, minlength=len(tasks))
+        return dict(zip(tasks, totals.tolist()))
+
+
+# ==================== メイン ====================
+
+def measure(paths):
+    # 元のCSV・Pythonオブジェクト（(datetime, str) のリスト）・符号化後のそれぞれのサイズ
+    raw_bytes = sum(os.path.getsize(path) for path in paths)
+    tracemalloc.start()
+    samples = [sample for path in paths for sample in iter_samples(path)]
+    objects_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del samples
+    return raw_bytes, objects_bytes
+
+
+def main(argv):
+    if len(argv) not in (1, 2) or not os.path.isdir(argv[0]):
+        print("使い方: python window_store.py <作業ウィンドウチェック式フォルダ> [出力フォルダ]")
+        return 1
+    paths = sample_files(argv[0])
+    if not paths:
+        print(f"❌ ログが見つかりません: {argv[0]}")
+        return 1
+    out_dir = argv[1] if len(argv) > 1 else os.path.join(argv[0], HISTORY_DIR)
+
+    began = time.perf_counter()
+    history = TitleHistory.from_files(paths)
+    history.save(out_dir)
+    built = time.perf_counter() - began
+    began = time.perf_counter()
+    loaded = TitleHistory.load(out_dir)
+    load_sec = time.perf_counter() - began
+
+    raw_bytes, objects_bytes = measure(paths)
+    encoded = loaded.nbytes()
+    print(f"✅ {len(loaded)}サンプル / タイトル{len(loaded.titles)}種類: {out_dir}（作成 {built:.3f}秒、読み込み {load_sec * 1000:.2f}ms）")
+    print(f"📦 CSV {raw_bytes / 1024:.0f}KB / Pythonオブジェクト {objects_bytes / 1024:.0f}KB → "
+          f"符号化 {encoded / 1024:.0f}KB（CSVの{encoded / raw_bytes * 100:.0f}%、オブジェクトの{encoded / objects_bytes * 100:.0f}%）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,76 @@
+# worklog_cube.py
+# 工数ログの集計キューブ（dashboard.py 用）。
+# 生ログを 日付 × タスク の合計分に1回だけまとめ、週・月・グループ（tracker_settings.json）の列を付けておく。
+# サマリー・グラフ・推移はこのキューブを期間で絞って合計するだけで、生ログを走査し直さない。
+
+import os
+
+import pandas as pd
+
+from task_groups import UNGROUPED_LABEL
+
+# ==================== 設定 ====================
+
+# チーム表示で付く列（worklog_team.py）
+MEMBER_COLUMN = "メンバー"
+# 推移グラフの集計単位 → キューブの列名
+PERIOD_COLUMNS = {"日別": "日付", "週別": "週", "月別": "月"}
+
+
+def settings_signature(settings_path):
+    try:
+        st = os.stat(settings_path)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+# ==================== キューブ ====================
+
+def build_cube(df, task_groups):
+    # 日付 × タスク（チーム表示では × メンバー）ごとの合計分 + 週（月曜始まりのISO週）・月・グループ。
+    # タスクの並びは生ログの初出順
+    keys = ["日付", "タスク"] + ([MEMBER_COLUMN] if MEMBER_COLUMN in df.columns else [])
+    cube = df.groupby(keys, sort=False, dropna=False)["分"].sum().reset_index()
+    dates = pd.to_datetime(cube["日付"])
+    cube["週"] = (dates - pd.to_timedelta(dates.dt.weekday, unit="D")).dt.date
+    cube["月"] = dates.dt.to_period("M").dt.start_time.dt.date
+    cube["グループ"] = cube["タスク"].map(task_groups).fillna(UNGROUPED_LABEL)
+    return cube
+
+
+def extend_cube(cube, df, task_groups):
+    # 追加された生ログ分だけ集計して既存のキューブに足す（生ログ全体は走査しない）
+    if df.empty:
+        return cube
+    added = build_cube(df, task_groups)
+    if cube.empty:
+        return added
+    keys = [c for c in cube.columns if c != "分"]
+    merged = pd.concat([cube, added], ignore_index=True)
+    return merged.groupby(keys, sort=False, dropna=False)["分"].sum().reset_index()[cube.columns]
+
+
+def slice_cube(cube, start=None, end=None):
+    # start/end は date（省略時は全期間）
+    if start is None and end is None:
+        return cube
+    return cube[(cube["日付"] >= start) & (cube["日付"] <= end)]
+
+
+def task_totals(cube):
+    # {タスク: 分}（初出順）
+    return cube.groupby("タスク", sort=False)["分"].sum().to_dict()
+
+
+def member_breakdown(cube, by="グループ"):
+    # メンバー（行）× グループ / タスク（列）の合計時間（h）。合計の多い順
+    table = cube.pivot_table(index=MEMBER_COLUMN, columns=by, values="分", aggfunc="sum", fill_value=0) / 60
+    return table.loc[table.sum(axis=1).sort_values().index]
+
+
+def trend(cube, period="週別", by="グループ"):
+    # 期間（行）× グループ / タスク / メンバー（列）の合計時間（h）
+    column = PERIOD_COLUMNS[period]
+    table = cube.pivot_table(index=column, columns=by, values="分", aggfunc="sum", fill_value=0)
+    return (table / 60).sort_index()
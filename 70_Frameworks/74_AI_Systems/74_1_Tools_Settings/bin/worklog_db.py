@@ -0,0 +1,198 @@
+# worklog_db.py
+# 工数ログのSQLiteストア（任意）。work_log.xlsx と同じフォルダに work_log.db があれば有効になる。
+#
+#   python worklog_db.py import <work_log.xlsx>   既存のExcelを一括移行
+#   python worklog_db.py export <work_log.xlsx>   SQLiteから WorkLog テーブルを再生成
+
+import os
+import sqlite3
+import sys
+import warnings
+from datetime import date
+
+from worklog_store import (HEADERS, WorkLogJournal, load_rows, make_table, normalize_row, normalize_rows,
+                           save_workbook_atomic, write_seq)
+
+# ==================== 設定 ====================
+
+DB_SUFFIX = ".db"
+SHEET_TITLE = "work_log"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS worklog (
+    id INTEGER PRIMARY KEY,
+    seq INTEGER UNIQUE,
+    "日付" TEXT NOT NULL,
+    "開始" TEXT,
+    "終了" TEXT,
+    "タスク" TEXT,
+    "分" REAL NOT NULL DEFAULT 0,
+    "メモ" TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_worklog_date ON worklog("日付");
+CREATE INDEX IF NOT EXISTS idx_worklog_task_date ON worklog("タスク", "日付");
+"""
+
+
+def db_path_for(xlsx_path):
+    return os.path.splitext(xlsx_path)[0] + DB_SUFFIX
+
+
+# ==================== ストア ====================
+
+class WorkLogDB:
+    # sqlite3 の接続はスレッドをまたげないので、使うスレッドごとにインスタンスを作る。
+    # xlsx_path を渡すと集計（latest_date / task_totals）にSQLiteへ書けずにジャーナルに残っている分も含める
+
+    def __init__(self, path, xlsx_path=None):
+        self.path = path
+        self.xlsx_path = xlsx_path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def insert_entries(self, entries):
+        # entries: [(seq, row), ...]  seq が同じものは無視するので何度流しても重複しない
+        values = []
+        for seq, row in entries:
+            norm = normalize_row(row)
+            if norm is not None:
+                values.append((seq,) + norm)
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO worklog (seq, "日付", "開始", "終了", "タスク", "分", "メモ") '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', values)
+        return len(values)
+
+    def _unsynced(self):
+        # 正規化済みの未同期分（xlsx_path が無ければ空）
+        return normalize_rows(unsynced_rows(self.conn, self.xlsx_path)) if self.xlsx_path else []
+
+    def latest_date(self):
+        iso = self.conn.execute('SELECT MAX("日付") FROM worklog').fetchone()[0]
+        iso = max([row[0] for row in self._unsynced()] + ([iso] if iso else []), default=None)
+        return date.fromisoformat(iso) if iso else None
+
+    def max_seq(self):
+        return self.conn.execute("SELECT MAX(seq) FROM worklog").fetchone()[0] or 0
+
+    def task_totals(self, start=None, end=None):
+        # 期間内のタスク別合計（分）。start/end は date（省略時は全期間）
+        sql = 'SELECT "タスク", SUM("分") FROM worklog'
+        params = []
+        if start is not None and end is not None:
+            sql += ' WHERE "日付" BETWEEN ? AND ?'
+            params = [start.isoformat(), end.isoformat()]
+        sql += ' GROUP BY "タスク" ORDER BY MIN(id)'
+        totals = dict(self.conn.execute(sql, params).fetchall())
+        for iso, _, _, task, minutes, _ in self._unsynced():
+            if start is None or end is None or start.isoformat() <= iso <= end.isoformat():
+                totals[task] = totals.get(task, 0.0) + minutes
+        return totals
+
+    def iter_rows(self):
+        cur = self.conn.execute(
+            'SELECT "日付", "開始", "終了", "タスク", "分", "メモ" FROM worklog ORDER BY "日付", id')
+        for iso, start, end, task, minutes, memo in cur:
+            yield [iso.replace("-", "/"), start, end, task, minutes, memo]
+
+    def iter_normalized(self):
+        # load_rows と同じ形（ISO日付, 開始, 終了, タスク, 分, メモ）
+        return self.conn.execute(
+            'SELECT "日付", "開始", "終了", "タスク", "分", COALESCE("メモ", \'\') FROM worklog ORDER BY "日付", id')
+
+    # ---------- Excel との相互変換 ----------
+
+    def import_xlsx(self, xlsx_path):
+        _, values = load_rows(xlsx_path)
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO worklog ("日付", "開始", "終了", "タスク", "分", "メモ") '
+                'VALUES (?, ?, ?, ?, ?, ?)', values)
+        return len(values)
+
+    def export_xlsx(self, xlsx_path):
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(SHEET_TITLE)
+        ws.append(HEADERS)
+        last_row = 1
+        for row in self.iter_rows():
+            ws.append(row)
+            last_row += 1
+        with warnings.catch_warnings():
+            # 列名は make_table で設定済み（write-only モードの注意喚起を抑制）
+            warnings.simplefilter("ignore", UserWarning)
+            ws.add_table(make_table(last_row))
+        # ジャーナルの取り込み済み位置も引き継ぐ（次回 compact で二重に追加しない）
+        write_seq(wb, self.max_seq())
+        save_workbook_atomic(wb, xlsx_path)
+        return last_row - 1
+
+
+def unsynced_rows(conn, xlsx_path):
+    # ジャーナルにあってSQLiteにまだ無い行（書き込みスレッドがSQLiteへの書き込みに失敗して残している分）
+    entries = WorkLogJournal(xlsx_path).read_entries()
+    if not entries:
+        return []
+    known = {seq for (seq,) in conn.execute(
+        "SELECT seq FROM worklog WHERE seq >= ?", (min(seq for seq, _ in entries),))}
+    return [row for seq, row in entries if seq not in known]
+
+
+def open_if_enabled(xlsx_path):
+    path = db_path_for(xlsx_path)
+    return WorkLogDB(path) if os.path.exists(path) else None
+
+
+# ==================== メイン ====================
+
+def main(argv):
+    if len(argv) != 2 or argv[0] not in ("import", "export"):
+        print("使い方: python worklog_db.py import|export <work_log.xlsx>")
+        return 1
+    command, xlsx_path = argv
+    path = db_path_for(xlsx_path)
+
+    if command == "import":
+        if os.path.exists(path):
+            print(f"❌ 既に存在します: {path}")
+            return 1
+        if not os.path.exists(xlsx_path):
+            print(f"❌ Excelが見つかりません: {xlsx_path}")
+            return 1
+        # 一時ファイルに移行し切ってから置き換える（読み込みに失敗しても空のDBを残さない。
+        # トラッカーは work_log.db ができた時点でそちらに書き始めるため）
+        tmp = path + ".tmp"
+        for leftover in (tmp, tmp + "-wal", tmp + "-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        db = WorkLogDB(tmp)
+        try:
+            n = db.import_xlsx(xlsx_path)
+        except Exception as e:
+            db.close()
+            os.remove(tmp)
+            print(f"❌ 移行できませんでした: {e}")
+            return 1
+        db.close()
+        os.replace(tmp, path)
+        print(f"✅ {n}行を移行しました: {path}")
+        return 0
+
+    if not os.path.exists(path):
+        print(f"❌ DBが見つかりません: {path}")
+        return 1
+    db = WorkLogDB(path)
+    n = db.export_xlsx(xlsx_path)
+    print(f"✅ {n}行を書き出しました: {xlsx_path}")
+    db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
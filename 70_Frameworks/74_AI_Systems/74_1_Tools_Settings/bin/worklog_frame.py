@@ -0,0 +1,130 @@
+# worklog_frame.py
+# 工数ログを pandas の DataFrame として読み込む（dashboard.py 用）。
+# 行ごとの Python ループを使わず、列単位でまとめて変換する。
+# python-calamine が入っていればそれでシートを読む（openpyxl の約10倍速い）。
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from worklog_db import db_path_for, unsynced_rows
+from worklog_store import HEADERS, WorkLogJournal, journal_path_for, read_seq, read_seq_from_file, to_hhmm
+
+try:
+    from python_calamine import CalamineWorkbook
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+# ==================== 設定 ====================
+
+COLUMNS = HEADERS
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def log_signature(xlsx_path):
+    # キャッシュのキー。Excel・SQLite・ジャーナルのどれかが変わったら読み直す。
+    # SQLiteはWALモードで、書き込みスレッドが接続を開いている間の追記は -wal ファイルにだけ入るので両方を見る
+    db_path = db_path_for(xlsx_path)
+    db_sig = file_signature(db_path)
+    if db_sig is not None:
+        db_sig = (db_sig, file_signature(db_path + "-wal"))
+    return file_signature(xlsx_path), db_sig, file_signature(journal_path_for(xlsx_path))
+
+
+# ==================== 読み込み ====================
+
+def normalize_frame(raw):
+    # 生の6列 → 日付は date、開始・終了は 'HH:MM'、分は float、メモは空文字埋め。日付が読めない行は捨てる
+    raw = raw.reindex(columns=range(len(COLUMNS)))
+    raw.columns = COLUMNS
+    # 文字列（'2026/1/5'・'2026-01-05 00:00:00'）も datetime も日付部分だけ取り出して一度に変換
+    text = raw["日付"].astype("string").str.strip().str.split(n=1).str[0].str.replace("-", "/", regex=False)
+    dates = pd.to_datetime(text, format="%Y/%m/%d", errors="coerce")
+    df = raw[dates.notna().to_numpy()].copy()
+    df["日付"] = dates[dates.notna()].dt.date.to_numpy()
+    for col in ("開始", "終了"):
+        df[col] = df[col].map(to_hhmm, na_action="ignore")
+    df["分"] = pd.to_numeric(df["分"], errors="coerce").fillna(0.0).astype(float)
+    df["メモ"] = df["メモ"].fillna("").astype(str)
+    return df.reset_index(drop=True)
+
+
+def load_xlsx_frame(xlsx_path):
+    # (取り込み済みseq, 先頭6列の生データ)
+    if HAS_CALAMINE:
+        # pandas.read_excel(engine="calamine") はセルごとに Python で変換し直すので直接使う
+        rows = CalamineWorkbook.from_path(xlsx_path).get_sheet_by_index(0).to_python(skip_empty_area=False)
+        raw = pd.DataFrame(rows[1:], dtype=object).iloc[:, :len(COLUMNS)]
+        # 空セルは '' で返るので openpyxl（None）に揃える
+        return read_seq_from_file(xlsx_path), raw.where(raw.ne(""), None)
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        seq = read_seq(wb)
+        raw = pd.DataFrame(wb.active.iter_rows(min_row=2, max_col=len(COLUMNS), values_only=True))
+    finally:
+        wb.close()
+    return seq, raw
+
+
+def load_frame(xlsx_path):
+    # SQLiteがあればそこから（+ SQLiteに書けずに残っているジャーナル分）、なければExcel + まだ取り込まれていないジャーナル分
+    db_path = db_path_for(xlsx_path)
+    if os.path.exists(db_path):
+        import sqlite3
+
+        with sqlite3.connect(db_path) as conn:
+            df = pd.read_sql_query(
+                'SELECT "日付", "開始", "終了", "タスク", "分", COALESCE("メモ", \'\') AS "メモ" '
+                'FROM worklog ORDER BY "日付", id', conn)
+            unsynced = unsynced_rows(conn, xlsx_path)
+        df["日付"] = pd.to_datetime(df["日付"], format="%Y-%m-%d").dt.date
+        if unsynced:
+            df = pd.concat([df, normalize_frame(pd.DataFrame(unsynced))], ignore_index=True)
+        return df
+
+    seq, raw = load_xlsx_frame(xlsx_path) if os.path.exists(xlsx_path) else (0, pd.DataFrame())
+    pending = [row for s, row in WorkLogJournal(xlsx_path).read_entries() if s > seq]
+    if pending:
+        raw = pd.concat([raw, pd.DataFrame(pending)], ignore_index=True)
+    if raw.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    return normalize_frame(raw)
+
+
+# ==================== 詳細表示 ====================
+
+def match_rows(df, rows=None, search=""):
+    # 対象行の位置（np.ndarray）。rows: 期間などで絞った位置（None なら全行）、search: タスク・メモの部分一致
+    positions = np.arange(len(df)) if rows is None else rows
+    if not search:
+        return positions
+    hit = np.zeros(len(positions), dtype=bool)
+    for col in ("タスク", "メモ"):
+        values = df[col].iloc[positions]
+        hit |= values.astype(str).str.contains(search, case=False, regex=False).to_numpy()
+    return positions[hit]
+
+
+def page_rows(df, positions, page=0, page_size=100, sort_column=None, descending=True):
+    # 詳細データの1ページ分だけを取り出す（対象行全体のコピーは作らない）。sort_column: None なら記録順
+    if sort_column is not None:
+        # 並べ替えるのは対象の1列だけ。同じ値は記録順を保つ
+        order = df[sort_column].iloc[positions].reset_index(drop=True).sort_values(
+            ascending=not descending, kind="stable", na_position="last").index.to_numpy()
+        positions = positions[order]
+    elif descending:
+        positions = positions[::-1]
+    start = page * page_size
+    return df.iloc[positions[start:start + page_size]]
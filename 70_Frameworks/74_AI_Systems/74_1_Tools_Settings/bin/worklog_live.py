@@ -0,0 +1,145 @@
+# worklog_live.py
+# dashboard.py 用：工数ログを差分で取り込み続ける DataFrame + 集計キューブ。
+# トラッカーは行を末尾に追加するだけなので、前回までの行数とその範囲の内容ハッシュ（チェックポイント）を覚えておき、
+# 内容が一致すれば追加された行だけ正規化・集計して足す。途中の行が編集されていたときだけ全件を読み直す。
+#
+#   Excel      : シートの読み込み自体は毎回全体（xlsxは圧縮XMLで途中から読めない）。正規化・集計は追加分だけ
+#   ジャーナル : Excel未反映の分。ジャーナルだけ変わったとき（通常の記録中）はExcelを読まない
+#   SQLite     : 内容ハッシュを取るため読み込みは毎回全体。正規化・集計は id が前回より大きい行だけ（SQLiteに書けずにジャーナルに残っている分は別に足す）
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from task_groups import load_task_groups
+from worklog_cube import build_cube, extend_cube, settings_signature
+from worklog_db import db_path_for, unsynced_rows
+from worklog_frame import COLUMNS, load_xlsx_frame, log_signature, normalize_frame
+from worklog_store import WorkLogJournal
+
+
+def row_hashes(raw):
+    # 生データの行ごとのハッシュ（np.ndarray[uint64]）
+    return pd.util.hash_pandas_object(raw.astype(str), index=False).to_numpy()
+
+
+def digest(hashes):
+    return hashlib.blake2b(hashes.tobytes(), digest_size=16).hexdigest()
+
+
+def empty_frame():
+    return pd.DataFrame(columns=COLUMNS)
+
+
+# ==================== 差分取り込み ====================
+
+class LiveWorkLog:
+
+    def __init__(self, xlsx_path, settings_path):
+        self.xlsx_path = xlsx_path
+        self.db_path = db_path_for(xlsx_path)
+        self.settings_path = settings_path
+        self.task_groups = {}
+        self.lock = threading.Lock()
+
+        # Excel / SQLite から取り込んだ分
+        self.base = empty_frame()
+        self.base_cube = build_cube(self.base, {})
+        self.base_seq = 0
+        # チェックポイント：取り込んだ行数（SQLiteは最大id）と、その範囲の内容ハッシュ
+        self.checkpoint = (0, None)
+        # ジャーナルの未反映分
+        self.pending = empty_frame()
+
+        self.signature = None
+        self.groups_signature = None
+        self.frame = self.base
+        self.cube = self.base_cube
+        # 直近の更新内容（"full" / "append" / "pending" / "none"）と正規化した行数
+        self.last_refresh = ("none", 0)
+
+    def refresh(self):
+        with self.lock:
+            signature = log_signature(self.xlsx_path)
+            groups_signature = settings_signature(self.settings_path)
+            if signature == self.signature and groups_signature == self.groups_signature:
+                self.last_refresh = ("none", 0)
+                return False
+
+            kind, rows = "pending", 0
+            if groups_signature != self.groups_signature:
+                # グループ分けが変わっただけならファイルは読み直さずキューブだけ作り直す
+                self.task_groups = load_task_groups(self.settings_path)
+                self.base_cube = build_cube(self.base, self.task_groups)
+                self.groups_signature = groups_signature
+
+            old = self.signature or (None, None, None)
+            xlsx_sig, db_sig, journal_sig = signature
+            if db_sig is not None:
+                if db_sig != old[1]:
+                    kind, rows = self._refresh_db()
+                self.pending = self._read_unsynced()
+                rows += len(self.pending)
+            else:
+                if xlsx_sig != old[0] or old[1] is not None:
+                    kind, rows = self._refresh_xlsx()
+                self.pending = self._read_pending()
+                rows += len(self.pending)
+
+            self.signature = signature
+            self.frame = pd.concat([self.base, self.pending], ignore_index=True) if len(self.pending) else self.base
+            self.cube = extend_cube(self.base_cube, self.pending, self.task_groups)
+            self.last_refresh = (kind, rows)
+            return True
+
+    def _append_or_reset(self, new, full):
+        if full:
+            self.base = new
+            self.base_cube = build_cube(new, self.task_groups)
+            return "full", len(new)
+        if len(new):
+            self.base = pd.concat([self.base, new], ignore_index=True)
+            self.base_cube = extend_cube(self.base_cube, new, self.task_groups)
+        return "append", len(new)
+
+    def _refresh_xlsx(self):
+        if not os.path.exists(self.xlsx_path):
+            self.base_seq, self.checkpoint = 0, (0, None)
+            return self._append_or_reset(empty_frame(), True)
+        seq, raw = load_xlsx_frame(self.xlsx_path)
+        hashes = row_hashes(raw)
+        count, prefix = self.checkpoint
+        full = not (prefix is not None and len(raw) >= count and digest(hashes[:count]) == prefix)
+        new_raw = raw if full else raw.iloc[count:]
+        new = normalize_frame(new_raw) if len(new_raw) else empty_frame()
+        self.base_seq, self.checkpoint = seq, (len(raw), digest(hashes))
+        return self._append_or_reset(new, full)
+
+    def _refresh_db(self):
+        # Excelと同じく、前回までの行（id順）の内容ハッシュが一致すれば id が前回より大きい行だけ足す
+        last_id, prefix = self.checkpoint
+        with sqlite3.connect(self.db_path) as conn:
+            raw = pd.read_sql_query(
+                'SELECT id, "日付", "開始", "終了", "タスク", "分", COALESCE("メモ", \'\') AS "メモ" '
+                'FROM worklog ORDER BY id', conn)
+        hashes = row_hashes(raw)
+        count = int(np.searchsorted(raw["id"].to_numpy(), last_id, side="right"))
+        full = prefix is None or digest(hashes[:count]) != prefix
+        new = (raw if full else raw.iloc[count:]).drop(columns="id").reset_index(drop=True)
+        new["日付"] = pd.to_datetime(new["日付"], format="%Y-%m-%d").dt.date
+        self.checkpoint = (int(raw["id"].iloc[-1]) if len(raw) else 0, digest(hashes))
+        return self._append_or_reset(new, full)
+
+    def _read_pending(self):
+        pending = [row for s, row in WorkLogJournal(self.xlsx_path).read_entries() if s > self.base_seq]
+        return normalize_frame(pd.DataFrame(pending)) if pending else empty_frame()
+
+    def _read_unsynced(self):
+        # SQLiteモード：ジャーナルに残っていてSQLiteにまだ無い分
+        with sqlite3.connect(self.db_path) as conn:
+            unsynced = unsynced_rows(conn, self.xlsx_path)
+        return normalize_frame(pd.DataFrame(unsynced)) if unsynced else empty_frame()
@@ -0,0 +1,167 @@
+# worklog_rollup.py
+# 日付 × タスクごとの合計分を保持する集計キャッシュ（work_log.rollup.json）。
+# 書き込みスレッドが追記のたびに差分を足し込み、分析画面は必要な期間だけ合計する。
+# work_log.xlsx のサイズ・更新時刻が記録と違う（トラッカー外で編集された）ときだけ全件から作り直す。
+
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import date
+
+from worklog_store import WorkLogJournal, load_rows, normalize_row
+
+# ==================== 設定 ====================
+
+ROLLUP_SUFFIX = ".rollup.json"
+ROLLUP_VERSION = 1
+
+# 書き込みスレッドと分析画面（Tkスレッド）が同じファイルを更新するため
+_LOCK = threading.Lock()
+
+
+def rollup_path_for(xlsx_path):
+    return os.path.splitext(xlsx_path)[0] + ROLLUP_SUFFIX
+
+
+def _source_signature(xlsx_path):
+    try:
+        st = os.stat(xlsx_path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+# ==================== 集計キャッシュ ====================
+
+class WorkLogRollup:
+
+    def __init__(self, xlsx_path):
+        self.xlsx_path = xlsx_path
+        self.path = rollup_path_for(xlsx_path)
+
+    # ---------- ファイル入出力 ----------
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf_8") as f:
+                data = json.load(f)
+            if data.get("version") == ROLLUP_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _save(self, data):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf_8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    # ---------- 書き込みスレッドから ----------
+
+    def add_entries(self, entries):
+        # entries: [(seq, row), ...]  既に足し込んだseq以下は無視する
+        with _LOCK:
+            data = self._load()
+            if data is None:
+                # まだ作られていない／壊れている。次に分析画面を開いたときに作り直す
+                return
+            fold_entries(data, entries)
+            self._save(data)
+
+    def is_current(self):
+        # 記録してあるExcelの状態と一致するか（トラッカー外で編集されていないか）
+        data = self._load()
+        return data is not None and data["source"] == _source_signature(self.xlsx_path)
+
+    def mark_source(self):
+        # トラッカー自身がExcelへ取り込んだ後に呼ぶ（中身は add_entries で反映済み）
+        with _LOCK:
+            data = self._load()
+            if data is not None:
+                data["source"] = _source_signature(self.xlsx_path)
+                self._save(data)
+
+    def invalidate(self):
+        with _LOCK:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    # ---------- 分析画面から ----------
+
+    def rebuild(self):
+        # 作り直した内容を返す。読んでいる間に書き込みスレッドがExcelへ取り込んだ（サイズ・更新時刻が
+        # 読む前と違う）ときは読み直す。取り込み後はジャーナルが消えるので、古いExcelの行に新しい署名を付けると
+        # 取り込んだ分が集計から抜けたままになる
+        while True:
+            source = _source_signature(self.xlsx_path)
+            days = defaultdict(dict)
+            last_seq = 0
+            if source is not None:
+                last_seq, rows = load_rows(self.xlsx_path)
+                for iso, _, _, task, minutes, _ in rows:
+                    days[iso][task] = days[iso].get(task, 0.0) + minutes
+            data = {
+                "version": ROLLUP_VERSION,
+                "source": source,
+                "seq": last_seq,
+                "days": dict(days),
+            }
+            with _LOCK:
+                # Excelへ未取り込みのジャーナル分を足す。ジャーナルを消すのはExcelを書き換えた後なので、
+                # ジャーナルを読んだ後にExcelが変わっていなければ取りこぼしは無い
+                fold_entries(data, WorkLogJournal(self.xlsx_path).read_entries())
+                if _source_signature(self.xlsx_path) == source:
+                    self._save(data)
+                    return data
+
+    def load_days(self):
+        data = self._load()
+        if data is None or data["source"] != _source_signature(self.xlsx_path):
+            data = self.rebuild()
+        return data["days"]
+
+
+def fold_entries(data, entries):
+    # ジャーナルのエントリを集計に足す（data["seq"] 以下は足し込み済みとして飛ばす）
+    last_seq = data["seq"]
+    days = data["days"]
+    for seq, row in entries:
+        if seq <= last_seq:
+            continue
+        norm = normalize_row(row)
+        if norm is not None:
+            iso, _, _, task, minutes, _ = norm
+            tasks = days.setdefault(iso, {})
+            tasks[task] = tasks.get(task, 0.0) + minutes
+        data["seq"] = max(data["seq"], seq)
+
+
+class RollupView:
+    # WorkLogDB と同じ集計メソッド（latest_date / task_totals / close）を集計キャッシュの上に用意する
+
+    def __init__(self, days):
+        self.days = days
+
+    def latest_date(self):
+        return date.fromisoformat(max(self.days)) if self.days else None
+
+    def task_totals(self, start=None, end=None):
+        return task_totals(self.days, start, end)
+
+    def close(self):
+        pass
+
+
+def task_totals(days, start=None, end=None):
+    # 期間内のタスク別合計（分）。start/end は date（省略時は全期間）
+    lo = start.isoformat() if start is not None else None
+    hi = end.isoformat() if end is not None else None
+    task_time = defaultdict(float)
+    for iso in sorted(days):
+        if lo is not None and not lo <= iso <= hi:
+            continue
+        for task, minutes in days[iso].items():
+            task_time[task] += minutes
+    return task_time
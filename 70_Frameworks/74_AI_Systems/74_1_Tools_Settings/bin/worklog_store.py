@@ -0,0 +1,481 @@
+# worklog_store.py
+# 工数ログの永続化（追記専用ジャーナル + Excelへのまとめ書き込み）
+
+import json
+import os
+import queue
+import threading
+import time
+import zipfile
+from datetime import date, datetime, time as dtime
+from xml.etree.ElementTree import ParseError
+
+# openpyxl は読み込みに時間がかかるため、Excelを実際に読み書きする関数の中で import する
+
+# ==================== 設定 ====================
+
+HEADERS = ["日付", "開始", "終了", "タスク", "分", "メモ"]
+TABLE_NAME = "WorkLog"
+JOURNAL_SUFFIX = ".journal.jsonl"
+# Excelに取り込み済みの最終シーケンス番号（ブックのユーザー設定プロパティに保持）
+SEQ_PROPERTY = "strat_lab_journal_seq"
+# PermissionError（Excelで開いている・OneDrive同期中）時の再試行間隔（秒）
+RETRY_DELAYS = (0.5, 1, 2, 4, 8)
+# 再試行を使い切った後、次に自動で取り込みを試すまでの秒数
+LOCKED_RETRY_SEC = 60
+
+# ==================== 行データ ====================
+
+def make_row(task, start, end, memo=""):
+    dur = round((end - start).total_seconds() / 60, 1)
+    return [
+        start.strftime("%Y/%m/%d"),
+        start.strftime("%H:%M"),
+        end.strftime("%H:%M"),
+        task,
+        dur,
+        memo
+    ]
+
+
+def journal_path_for(xlsx_path):
+    return os.path.splitext(xlsx_path)[0] + JOURNAL_SUFFIX
+
+
+def warm_up():
+    # 起動後にバックグラウンドで呼び、最初の保存時の import 待ちをなくす
+    import openpyxl  # noqa: F401
+    from openpyxl.worksheet.table import Table  # noqa: F401
+
+
+# ==================== 値の正規化 ====================
+
+def to_iso_date(value):
+    # 日付は 'YYYY-MM-DD' で保存する（文字列比較がそのまま範囲検索になる）
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if not value or not str(value).strip():
+        return None
+    text = str(value).strip().split()[0]
+    for fmt in ("%Y/%m/%d", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def to_hhmm(value):
+    if isinstance(value, (datetime, dtime)):
+        return value.strftime("%H:%M")
+    return None if value is None else str(value)
+
+
+def to_minutes(value):
+    try:
+        return float(value) if value else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def normalize_row(row):
+    # make_row / Excelの行（6列）→ 正規化した列値（日付はISO形式）。日付が読めない行は None
+    iso = to_iso_date(row[0])
+    if iso is None:
+        return None
+    return (iso, to_hhmm(row[1]), to_hhmm(row[2]), row[3], to_minutes(row[4]), row[5] or "")
+
+
+def normalize_rows(rows):
+    # 大量の行をまとめて正規化する。同じ日付が何十行も続くので日付の解析は値ごとに1回だけ
+    date_cache = {}
+    result = []
+    for row in rows:
+        raw_date = row[0]
+        if raw_date not in date_cache:
+            date_cache[raw_date] = to_iso_date(raw_date)
+        iso = date_cache[raw_date]
+        if iso is None:
+            continue
+        row = tuple(row) + (None,) * (6 - len(row))
+        result.append((iso, to_hhmm(row[1]), to_hhmm(row[2]), row[3], to_minutes(row[4]), row[5] or ""))
+    return result
+
+
+# ==================== Excel読み込み ====================
+
+# パス → ((サイズ, 更新時刻), 取り込み済みseq, 正規化済みの行)
+_ROWS_CACHE = {}
+
+
+def load_rows(xlsx_path):
+    # 読み取り専用のストリーミング読み込み（セル・スタイルのオブジェクトを作らない）。
+    # ファイルのサイズと更新時刻が変わらない限り前回の結果を使い回す。
+    st = os.stat(xlsx_path)
+    signature = (st.st_size, st.st_mtime_ns)
+    cached = _ROWS_CACHE.get(xlsx_path)
+    if cached is not None and cached[0] == signature:
+        return cached[1], cached[2]
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        seq = read_seq(wb)
+        raw = wb.active.iter_rows(min_row=2, max_col=6, values_only=True)
+        rows = normalize_rows(raw)
+    finally:
+        wb.close()
+    _ROWS_CACHE[xlsx_path] = (signature, seq, rows)
+    return seq, rows
+
+
+# ==================== Excel書き込み ====================
+
+def read_seq(wb):
+    props = wb.custom_doc_props
+    if SEQ_PROPERTY in props.names:
+        try:
+            return int(props[SEQ_PROPERTY].value)
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+def read_seq_from_file(xlsx_path):
+    # ブック全体を開かずに docProps/custom.xml だけ読む（openpyxl 以外でシートを読む場合用）
+    import xml.etree.ElementTree as ET
+
+    with zipfile.ZipFile(xlsx_path) as z:
+        if "docProps/custom.xml" not in z.namelist():
+            return 0
+        root = ET.fromstring(z.read("docProps/custom.xml"))
+    for prop in root:
+        if prop.get("name") == SEQ_PROPERTY and len(prop):
+            try:
+                return int(prop[0].text)
+            except (TypeError, ValueError):
+                return 0
+    return 0
+
+
+def write_seq(wb, seq):
+    from openpyxl.packaging.custom import StringProperty
+
+    props = wb.custom_doc_props
+    if SEQ_PROPERTY in props.names:
+        props[SEQ_PROPERTY].value = str(seq)
+    else:
+        props.append(StringProperty(name=SEQ_PROPERTY, value=str(seq)))
+
+
+def make_table(last_row):
+    from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+
+    table = Table(displayName=TABLE_NAME, ref=f"A1:F{last_row}")
+    # write-only モードでも使えるよう列名を明示する
+    table.tableColumns = [TableColumn(id=i, name=h) for i, h in enumerate(HEADERS, 1)]
+    table.tableStyleInfo = TableStyleInfo(
+        name="TableStyleMedium9",
+        showFirstColumn=False,
+        showLastColumn=False,
+        showRowStripes=True,
+        showColumnStripes=False
+    )
+    return table
+
+
+def append_rows_to_xlsx(xlsx_path, entries):
+    # entries: [(seq, row), ...]  取り込み済みのseqは読み飛ばす（冪等）
+    from openpyxl import load_workbook, Workbook
+
+    if os.path.exists(xlsx_path):
+        wb = load_workbook(xlsx_path)
+        ws = wb.active
+    else:
+        wb = Workbook()
+        ws = wb.active
+        ws.append(HEADERS)
+
+    last_seq = read_seq(wb)
+    pending = [(seq, row) for seq, row in entries if seq > last_seq]
+    if not pending:
+        return 0
+
+    for table_name in list(ws.tables.keys()):
+        del ws.tables[table_name]
+    for _, row in pending:
+        ws.append(row)
+    ws.add_table(make_table(ws.max_row))
+    write_seq(wb, max(seq for seq, _ in pending))
+    save_workbook_atomic(wb, xlsx_path)
+    return len(pending)
+
+
+def save_workbook_atomic(wb, xlsx_path):
+    # 一時ファイルに書き切ってから置き換える（途中で落ちても壊れたxlsxを残さない）
+    tmp = xlsx_path + ".tmp"
+    try:
+        wb.save(tmp)
+        os.replace(tmp, xlsx_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# ==================== ジャーナル ====================
+
+class WorkLogJournal:
+    # 1エントリ = JSON 1行。追記 + fsync のみなので履歴の長さに関係なく一定時間で終わる。
+    # compact() でまとめて work_log.xlsx の WorkLog テーブルへ取り込む。
+
+    def __init__(self, xlsx_path):
+        self.xlsx_path = xlsx_path
+        self.path = journal_path_for(xlsx_path)
+        self._last_seq = 0
+        # 取り込み済みseqを読めたか（最初の追記時に読む。読むだけの用途ではExcelを開かない）
+        self._seeded = False
+
+    def _next_seq(self):
+        # 時刻ベースの単調増加番号。時計が戻っても（NTP補正など）取り込み済み・ジャーナル内の最大seqより
+        # 大きくする（小さいseqは append_rows_to_xlsx で取り込み済みとして読み飛ばされてしまう）
+        if not self._seeded:
+            floor = max([0] + [seq for seq, _ in self.read_entries()])
+            try:
+                if os.path.exists(self.xlsx_path):
+                    floor = max(floor, read_seq_from_file(self.xlsx_path))
+                self._seeded = True
+            except (zipfile.BadZipFile, OSError, ParseError):
+                # 壊れている・同期中などでExcelが読めなくても追記は止めない（次の追記でもう一度読む）
+                pass
+            self._last_seq = max(self._last_seq, floor)
+        self._last_seq = max(time.time_ns(), self._last_seq + 1)
+        return self._last_seq
+
+    def append(self, row):
+        return self.append_many([row])[0]
+
+    def append_many(self, rows):
+        # 複数行をまとめて1回の書き込み + fsync で追記する
+        seqs = [self._next_seq() for _ in rows]
+        lines = "".join(json.dumps({"seq": seq, "row": row}, ensure_ascii=False) + "\n"
+                        for seq, row in zip(seqs, rows))
+        with open(self.path, "a", encoding="utf_8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        return seqs
+
+    def read_entries(self):
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, "r", encoding="utf_8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    item = json.loads(line)
+                    entries.append((int(item["seq"]), item["row"]))
+                except (ValueError, KeyError, TypeError):
+                    # 書き込み途中で落ちた末尾行などは無視
+                    continue
+        return entries
+
+    def pending_count(self):
+        return len(self.read_entries())
+
+    def compact(self, keep=False):
+        # keep=True ならExcelへ取り込んだ後もジャーナルを消さない（SQLiteへの書き込みが済んでいない分を残す）
+        entries = self.read_entries()
+        if not entries:
+            return 0
+        added = append_rows_to_xlsx(self.xlsx_path, entries)
+        if not keep:
+            self._truncate(max(seq for seq, _ in entries))
+        return added
+
+    def _truncate(self, upto_seq):
+        # 取り込み中に追記されたエントリだけ残して書き戻す
+        remaining = [(seq, row) for seq, row in self.read_entries() if seq > upto_seq]
+        if not remaining:
+            os.remove(self.path)
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf_8") as f:
+            for seq, row in remaining:
+                f.write(json.dumps({"seq": seq, "row": row}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+# ==================== 書き込みスレッド ====================
+
+class PersistenceWorker(threading.Thread):
+    # UIスレッドはキューに積むだけ。ジャーナル追記とExcelへの取り込みはこのスレッドで行う。
+    # status は UI 側から root.after で定期的に読み取る（Tkをこのスレッドから触らない）。
+    # db_factory を渡すとSQLiteストアにも書き込む（接続はこのスレッド内で作る。DBがまだ無ければ None を返す）。
+    # rollup を渡すと日付×タスクの集計キャッシュにも差分を足し込む。
+
+    def __init__(self, journal, idle_compact_sec=600, db_factory=None, rollup=None):
+        super().__init__(name="worklog-writer", daemon=True)
+        self.journal = journal
+        self.idle_compact_sec = idle_compact_sec
+        self.db_factory = db_factory
+        self.db = None
+        self.rollup = rollup
+        self.queue = queue.Queue()
+        self._status_lock = threading.Lock()
+        self._status = {"pending": journal.pending_count(), "state": "idle", "error": None}
+        self._next_compact_at = None
+
+    @property
+    def status(self):
+        with self._status_lock:
+            return dict(self._status)
+
+    def _set_status(self, **kwargs):
+        with self._status_lock:
+            self._status.update(kwargs)
+
+    def submit(self, row):
+        self.queue.put(("row", row))
+
+    def request_compact(self):
+        self.queue.put(("compact", None))
+
+    def flush(self, timeout=None):
+        # キューを書き切り、Excelへの取り込みまで待つ。未反映が残っていなければ True
+        done = threading.Event()
+        self.queue.put(("flush", done))
+        if not done.wait(timeout):
+            return False
+        return self.status["pending"] == 0
+
+    def request_stop(self):
+        # 待たずに終了だけ依頼する（残りの書き込み・取り込みを済ませてからスレッドが終わる）。完了時にセットされる Event を返す
+        done = threading.Event()
+        self.queue.put(("stop", done))
+        return done
+
+    def stop(self, timeout=None):
+        self.request_stop().wait(timeout)
+        self.join(timeout)
+        return self.status["pending"] == 0
+
+    def run(self):
+        while True:
+            timeout = None
+            if self._next_compact_at is not None:
+                timeout = max(0, self._next_compact_at - time.monotonic())
+            try:
+                items = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                items = []
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = [payload for kind, payload in items if kind == "row"]
+            waiters = [payload for kind, payload in items if kind in ("flush", "stop")]
+            stopping = any(kind == "stop" for kind, _ in items)
+            compact = (not items or waiters
+                       or any(kind == "compact" for kind, _ in items))
+
+            if rows:
+                self._append(rows)
+            if compact:
+                try:
+                    self._compact()
+                except Exception as e:
+                    # Excelが壊れている・読めないなど。ジャーナルには残っているのでスレッドは止めずに時間を置いて再挑戦
+                    self._set_status(pending=self.journal.pending_count(), state="error", error=str(e))
+                    self._next_compact_at = time.monotonic() + LOCKED_RETRY_SEC
+            for done in waiters:
+                done.set()
+            if stopping:
+                if self.db is not None:
+                    self.db.close()
+                return
+
+    def _sync_db(self, entries):
+        # ジャーナルと同じseqで書くので、同じエントリを何度流しても重複しない。書けたら（DBが無ければ） True
+        if self.db_factory is None:
+            return True
+        try:
+            if self.db is None:
+                # トラッカー起動後に worklog_db.py import で作られた場合もここで拾う
+                self.db = self.db_factory()
+                if self.db is None:
+                    return True
+            self.db.insert_entries(entries)
+            return True
+        except Exception as e:
+            # DBはExcelの補助。書けるまでジャーナルを消さずに残し、次回の取り込みで再同期する
+            self._set_status(error=str(e))
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+            return False
+
+    def _sync_rollup(self, entries):
+        if self.rollup is None:
+            return
+        try:
+            self.rollup.add_entries(entries)
+        except Exception as e:
+            # 集計キャッシュは作り直せるので記録は止めない
+            self._set_status(error=str(e))
+
+    def _append(self, rows):
+        try:
+            seqs = self.journal.append_many(rows)
+        except Exception as e:
+            # ジャーナルにも書けない場合はキューに戻して次回まとめて再試行
+            for row in rows:
+                self.queue.put(("row", row))
+            self._set_status(state="error", error=str(e))
+            time.sleep(RETRY_DELAYS[0])
+            return
+        self._set_status(pending=self._status["pending"] + len(rows), state="pending", error=None)
+        entries = list(zip(seqs, rows))
+        self._sync_db(entries)
+        self._sync_rollup(entries)
+        self._next_compact_at = time.monotonic() + self.idle_compact_sec
+
+    def _compact(self):
+        self._next_compact_at = None
+        entries = self.journal.read_entries()
+        db_synced = self._sync_db(entries)
+        # 取り込み前にExcelが外部で編集されていないか確認しておく
+        rollup_current = self.rollup is not None and self.rollup.is_current()
+        self._sync_rollup(entries)
+        for delay in (0,) + RETRY_DELAYS:
+            if delay:
+                self._set_status(state="locked")
+                time.sleep(delay)
+            try:
+                self.journal.compact(keep=not db_synced)
+                if self.rollup is not None:
+                    if rollup_current:
+                        self.rollup.mark_source()
+                    else:
+                        self.rollup.invalidate()
+                if not db_synced:
+                    # SQLiteに書けなかった分はジャーナルに残っている。時間を置いて再同期する
+                    self._set_status(pending=self.journal.pending_count(), state="pending")
+                    self._next_compact_at = time.monotonic() + LOCKED_RETRY_SEC
+                    return
+                self._set_status(pending=self.journal.pending_count(), state="idle", error=None)
+                return
+            except PermissionError as e:
+                self._set_status(error=str(e))
+        # 再試行を使い切った。ジャーナルには残っているので時間を置いて再挑戦
+        self._set_status(pending=self.journal.pending_count(), state="locked")
+        self._next_compact_at = time.monotonic() + LOCKED_RETRY_SEC
@@ -0,0 +1,70 @@
+# worklog_team.py
+# チーム表示用：共有フォルダ以下の全員分の work_log.xlsx を並列に読み込み、メンバー列を付けて1つにまとめる。
+# ファイルごとにサイズ・更新時刻でキャッシュし、変わったファイルだけプロセスプールで読み直す。
+
+import fnmatch
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from worklog_cube import MEMBER_COLUMN
+from worklog_frame import COLUMNS, load_frame, log_signature
+
+# ==================== 設定 ====================
+
+LOG_PATTERN = "*work_log*.xlsx"
+# 変わったファイルがこれ未満ならプロセスを起こさずその場で読む（起動コストの方が大きい）
+MIN_PARALLEL_FILES = 2
+
+# パス → (log_signature, DataFrame)。Streamlit のサーバープロセス内で再実行をまたいで使い回す
+_FRAME_CACHE = {}
+
+
+def discover_logs(directory):
+    # {メンバー名: パス}。ファイル名が work_log.xlsx ならフォルダ名、そうでなければファイル名の work_log より前
+    logs = {}
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.startswith("~$") or not fnmatch.fnmatch(name, LOG_PATTERN):
+                continue
+            path = os.path.join(dirpath, name)
+            stem = name[:name.index("work_log")].rstrip("_-. ")
+            member = stem or os.path.basename(dirpath)
+            if member in logs:
+                member = os.path.relpath(path, directory)
+            logs[member] = path
+    return logs
+
+
+def team_signature(logs):
+    # キャッシュのキー（誰かのログが変わったら変わる）
+    return tuple((member, path, log_signature(path)) for member, path in sorted(logs.items()))
+
+
+# ==================== 読み込み ====================
+
+def load_team(logs, max_workers=None):
+    # 全員分の DataFrame をメンバー列付きで結合する
+    signatures = {path: log_signature(path) for path in logs.values()}
+    changed = [path for path in logs.values()
+               if path not in _FRAME_CACHE or _FRAME_CACHE[path][0] != signatures[path]]
+
+    workers = min(len(changed), max_workers or os.cpu_count() or 1)
+    if len(changed) >= MIN_PARALLEL_FILES and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(load_frame, changed))
+    else:
+        frames = [load_frame(path) for path in changed]
+    for path, frame in zip(changed, frames):
+        _FRAME_CACHE[path] = (signatures[path], frame)
+
+    parts = []
+    for member, path in logs.items():
+        frame = _FRAME_CACHE[path][1]
+        if not frame.empty:
+            parts.append(frame.assign(**{MEMBER_COLUMN: member}))
+    if not parts:
+        return pd.DataFrame(columns=COLUMNS + [MEMBER_COLUMN])
+    return pd.concat(parts, ignore_index=True)